@@ -1,17 +1,30 @@
 import pandas as pd
 import numpy as np
 import json
+import io
+import gc
 import logging
 import os
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 from typing import Optional, Dict, Any
-from tqdm import tqdm
 
 # === Logging Setup ===
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Everything the cached master frame depends on: each source table's latest date and its
+# cumulative row-change counters from the statistics collector (flushed once the writing
+# pipeline's session goes idle or exits).
+MASTER_DATA_CACHE_KEY_QUERY = text("""
+    SELECT (SELECT MAX(date) FROM daily_stock_data),
+           (SELECT MAX(date) FROM daily_stock_analytics),
+           (SELECT string_agg(relname || ':' || (n_tup_ins + n_tup_upd + n_tup_del), ',' ORDER BY relname)
+            FROM pg_stat_user_tables
+            WHERE relname IN ('stocks', 'daily_stock_data', 'daily_stock_analytics'))
+""")
+
 class USMarketAnalyzer:
     """
     An optimized script to perform Relative Strength (RS) analysis on a universe of stocks
@@ -66,47 +79,122 @@ class USMarketAnalyzer:
             logging.error(f"❌ Database connection failed: {e}")
             self.engine = None
 
+    def _copy_query_to_frame(self, engine: Engine, query: str, dtypes: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """Streams a query result through COPY TO STDOUT and parses it into a DataFrame."""
+        # COPY delivers the rows as one CSV buffer instead of having the DB-API
+        # cursor fetch and box them row-by-row.
+        buffer = io.StringIO()
+        raw_conn = engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cur:
+                cur.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV HEADER", buffer)
+        finally:
+            raw_conn.close()
+        buffer.seek(0)
+        return pd.read_csv(buffer, parse_dates=['date'], dtype=dtypes)
+
     def load_data_from_database(self) -> Optional[pd.DataFrame]:
-        """Loads all required data for all stocks using a single, efficient JOIN query."""
+        """Loads all required data for all stocks using a JOIN query split into parallel ticker shards."""
         if not self.engine:
             logging.error("Cannot load data, no database engine.")
             return None
+        engine = self.engine
+
+        # The master frame joins raw prices with analytics, so a cached copy is reused only while
+        # both tables are unchanged: their latest dates plus Postgres' cumulative insert/update/delete
+        # counters, which also move when history is rewritten without a new date (full refreshes,
+        # analytics recomputes).
+        cache_path = os.path.join((self.config or {}).get('output_settings', {}).get('cache_directory', 'cache'), 'master_data.pkl')
+        try:
+            with engine.connect() as conn:
+                cache_key = "|".join(str(value) for value in conn.execute(MASTER_DATA_CACHE_KEY_QUERY).one())
+            cached_df = self.load_cached_master_data(cache_path, cache_key)
+            if cached_df is not None:
+                return cached_df
+        except Exception as e:
+            logging.warning(f"⚠️ Could not check master data cache: {e}")
+            cache_key = None
             
-        logging.info("Executing master query to load all data from the database...")
-        query = text("""
+        # Each shard is a disjoint ticker-hash partition of the master query; running them
+        # on separate connections overlaps server-side scans with client-side parsing.
+        num_shards = max(1, int((self.config or {}).get('pipeline_settings', {}).get('max_workers', 4)))
+        shard_queries = [f"""
             SELECT s.ticker, s.sector, s.industry, d.date, d.close, d.volume,
                    a.hlcc4, a.ma_20, a.ma_50, a.ma_200
             FROM stocks s
             JOIN daily_stock_data d ON s.ticker = d.ticker
             JOIN daily_stock_analytics a ON s.ticker = a.ticker AND d.date = a.date
-            ORDER BY s.ticker, d.date;
-        """)
+            WHERE (hashtext(s.ticker) & 2147483647) % {num_shards} = {shard}
+            ORDER BY s.ticker, d.date
+        """ for shard in range(num_shards)]
+        logging.info(f"Executing master query in {num_shards} parallel shards to load all data from the database...")
         
         try:
-            with self.engine.connect() as conn:
-                df = pd.read_sql(query, conn, parse_dates=['date'])
+            # Declared dtypes skip the parser's type inference and build the string columns
+            # as categoricals directly, so no per-row Python string objects are kept.
+            category_cols = ['ticker', 'sector', 'industry']
+            dtypes = {col: 'category' for col in category_cols}
+            # Prices and moving averages fit comfortably in float32, halving the frame's memory
+            # and bandwidth; volume stays float64 since share counts exceed float32's exact range.
+            dtypes.update({col: 'float32' for col in ['close', 'hlcc4', 'ma_20', 'ma_50', 'ma_200']})
+            dtypes['volume'] = 'float64'
+            with ThreadPoolExecutor(max_workers=num_shards) as executor:
+                frames = list(executor.map(lambda q: self._copy_query_to_frame(engine, q, dtypes), shard_queries))
+            # Each shard has its own category dictionary; aligning them to one shared, sorted
+            # dictionary lets concat keep the categorical dtype instead of falling back to object.
+            for col in category_cols:
+                categories = sorted(set().union(*(frame[col].cat.categories for frame in frames)))
+                for frame in frames:
+                    frame[col] = frame[col].cat.set_categories(categories)
+            df = pd.concat(frames, ignore_index=True)
             
             if df.empty:
                 logging.error("❌ No data returned from the database. Please check if the tables are populated.")
                 return None
             
             logging.info(f"✅ Successfully loaded {len(df)} total data points for {df['ticker'].nunique()} unique tickers.")
+            if cache_key is not None:
+                self.save_master_data_cache(df, cache_path, cache_key)
             return df
         except Exception as e:
             logging.error(f"❌ Failed to execute database query: {e}")
             return None
 
-    def calculate_rs_trend(self, crs_weekly: pd.Series) -> str:
-        """Calculate RS trend based on 12-week WoW changes."""
-        if len(crs_weekly) < 13:
-            return "Insufficient Data"
-        
-        recent_12_weeks_change = crs_weekly.pct_change().dropna().tail(12)
-        positive_weeks = (recent_12_weeks_change > 0).sum()
-        
-        if positive_weeks >= 8: return "Uptrend"
-        if positive_weeks <= 4: return "Downtrend"
-        return "Sideways"
+    def load_cached_master_data(self, cache_path: str, cache_key: str) -> Optional[pd.DataFrame]:
+        """Returns the cached master frame if it was saved under the given cache key."""
+        key_path = f"{cache_path}.key"
+        if not (os.path.exists(cache_path) and os.path.exists(key_path)):
+            return None
+        with open(key_path, 'r', encoding='utf-8') as f:
+            if f.read().strip() != cache_key:
+                logging.info("Master data cache is stale; reloading from the database.")
+                return None
+        df = pd.read_pickle(cache_path)
+        logging.info(f"✅ Loaded {len(df)} data points from cache (key {cache_key}).")
+        return df
+
+    def save_master_data_cache(self, df: pd.DataFrame, cache_path: str, cache_key: str) -> None:
+        """Writes the master frame and its latest-date key next to each other."""
+        try:
+            os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+            if os.path.exists(f"{cache_path}.key"):
+                os.remove(f"{cache_path}.key")
+            df.to_pickle(cache_path)
+            # The key is written last so a partially written cache is never treated as valid.
+            with open(f"{cache_path}.key", 'w', encoding='utf-8') as f:
+                f.write(cache_key)
+        except Exception as e:
+            logging.warning(f"⚠️ Could not write master data cache: {e}")
+
+    def rolling_sum_by_group(self, values: np.ndarray, positions: np.ndarray, window: int) -> np.ndarray:
+        """Trailing sum over `window` rows within contiguous groups; NaN until a group has `window` rows."""
+        # One running (cumulative) sum over the whole array: each window total is the difference of
+        # two prefix sums, so the cost is O(N) regardless of window size or number of groups.
+        prefix = np.concatenate(([0], np.cumsum(values)))
+        out = np.full(len(values), np.nan)
+        ends = np.flatnonzero(positions >= window - 1) + 1
+        out[ends - 1] = prefix[ends] - prefix[ends - window]
+        return out
 
     def run_vectorized_analysis(self, df: pd.DataFrame) -> Optional[pd.DataFrame]:
         """Performs the entire RS analysis using vectorized pandas operations."""
@@ -118,43 +206,64 @@ class USMarketAnalyzer:
             logging.error("❌ Benchmark ticker is not defined in config.json under the 'yfinance' section.")
             return None
         
-        if benchmark_ticker not in df['ticker'].unique():
+        # Categorical tickers let every groupby below work on integer codes, and the
+        # precomputed row positions turn per-ticker access into an index lookup.
+        df['ticker'] = df['ticker'].astype('category')
+        ticker_rows = df.groupby('ticker', sort=False, observed=True).indices
+
+        if benchmark_ticker not in ticker_rows:
             logging.error(f"❌ Benchmark ticker '{benchmark_ticker}' not found in the loaded data.")
             return None
         
-        benchmark_df = df[df['ticker'] == benchmark_ticker][['date', 'hlcc4']].rename(
-            columns={'hlcc4': 'hlcc_index'}
-        ).copy()
-
-        df = pd.merge(df, benchmark_df, on='date', how='left')
+        # The benchmark has one row per date, so a date -> hlcc4 lookup aligns it onto
+        # every row without the key handling and column copies of a full merge.
+        benchmark_rows = df.iloc[ticker_rows[benchmark_ticker]]
+        bench_map = pd.Series(benchmark_rows['hlcc4'].to_numpy(), index=benchmark_rows['date'].to_numpy())
+        df['hlcc_index'] = df['date'].map(bench_map)
         df['hlcc_index'] = df['hlcc_index'].replace(0, np.nan)
         df.dropna(subset=['hlcc_index'], inplace=True)
         df['crs'] = df['hlcc4'] / df['hlcc_index']
         logging.info("Calculated daily Comparative Relative Strength (CRS).")
 
-        all_tickers = df['ticker'].unique()
-        weekly_results = []
         logging.info("Resampling daily data to weekly frequency...")
-        for ticker in tqdm(all_tickers, desc="Resampling Stocks"):
-            ticker_df = df[df['ticker'] == ticker]
-            weekly_agg = ticker_df.resample('W-MON', on='date').agg({
-                'crs': 'last', 'volume': 'sum'
-            }).reset_index()
-            weekly_agg['ticker'] = ticker
-            weekly_results.append(weekly_agg)
-        weekly_df = pd.concat(weekly_results, ignore_index=True)
+        # Label each row with its W-MON bin (the Monday closing the week) and aggregate
+        # every ticker in one groupby pass instead of one resampler per ticker.
+        # Day 4 of the epoch (1970-01-05) is a Monday, so rounding each day number up to the
+        # next day with (days - 4) % 7 == 0 gives the bin label with plain integer arithmetic.
+        days = df['date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        df['week'] = (days + (4 - days) % 7).astype('datetime64[D]').astype('datetime64[ns]')
+        weekly_df = df.groupby(['ticker', 'week'], sort=False, observed=True).agg(
+            crs=('crs', 'last'), volume=('volume', 'sum')
+        ).reset_index().rename(columns={'week': 'date'})
+        # The daily frame is only needed for each ticker's latest row from here on, so
+        # release the columns that fed the weekly aggregation.
+        df.drop(columns=['hlcc4', 'hlcc_index', 'volume', 'week'], inplace=True)
 
         weekly_df.sort_values(by=['ticker', 'date'], inplace=True)
-        weekly_df['rs_3m_change'] = weekly_df.groupby('ticker')['crs'].pct_change(periods=13) * 100
-        weekly_df['rs_6m_change'] = weekly_df.groupby('ticker')['crs'].pct_change(periods=26) * 100
-        weekly_df['rs_12m_change'] = weekly_df.groupby('ticker')['crs'].pct_change(periods=52) * 100
-        weekly_df['avg_vol_9w'] = weekly_df.groupby('ticker')['volume'].transform(lambda x: x.rolling(window=9).mean())
+        # One grouping of the (already sorted) weekly frame, reused by every per-ticker calculation.
+        weekly_by_ticker = weekly_df.groupby('ticker', sort=False, observed=True)
+        weekly_df['rs_3m_change'] = weekly_by_ticker['crs'].pct_change(periods=13) * 100
+        weekly_df['rs_6m_change'] = weekly_by_ticker['crs'].pct_change(periods=26) * 100
+        weekly_df['rs_12m_change'] = weekly_by_ticker['crs'].pct_change(periods=52) * 100
+        # Rows of each ticker are contiguous, so the windowed counts below only need each row's position in its group.
+        week_position = weekly_by_ticker.cumcount().to_numpy()
+        weekly_df['avg_vol_9w'] = self.rolling_sum_by_group(weekly_df['volume'].to_numpy(dtype=np.int64), week_position, 9) / 9
         weekly_df['volume_strength'] = weekly_df['volume'] / weekly_df['avg_vol_9w'].replace(0, np.nan)
-        weekly_df['rs_trend'] = weekly_df.groupby('ticker')['crs'].transform(self.calculate_rs_trend)
+
+        # RS trend: count of positive WoW CRS changes over the trailing 12 weeks.
+        positive_week = (weekly_by_ticker['crs'].pct_change() > 0).to_numpy(dtype=np.int64)
+        positive_weeks = self.rolling_sum_by_group(positive_week, week_position, 12)
+        insufficient = week_position < 12
+        weekly_df['rs_trend'] = np.select(
+            [insufficient, positive_weeks >= 8, positive_weeks <= 4],
+            ['Insufficient Data', 'Uptrend', 'Downtrend'], default='Sideways'
+        )
         logging.info("Calculated all weekly analytics.")
 
-        latest_daily_data = df.loc[df.groupby('ticker')['date'].idxmax()].set_index('ticker')
-        latest_weekly_data = weekly_df.loc[weekly_df.groupby('ticker')['date'].idxmax()].set_index('ticker')
+        # Both frames are ordered by ticker then date (the master query's ORDER BY and the
+        # weekly sort above), so each ticker's latest row is simply its last one.
+        latest_daily_data = df.drop_duplicates('ticker', keep='last').set_index('ticker')
+        latest_weekly_data = weekly_df.drop_duplicates('ticker', keep='last').set_index('ticker')
 
         summary_df = latest_daily_data.join(latest_weekly_data, rsuffix='_weekly')
         final_cols = {
@@ -165,12 +274,17 @@ class USMarketAnalyzer:
             'volume_strength': 'volume_strength', 'crs': 'crs_weekly_current'
         }
         summary_df = summary_df.rename(columns=final_cols)
-        summary_df['above_20_ma'] = summary_df['latest_close'] > summary_df['sma_20']
-        summary_df['above_50_ma'] = summary_df['latest_close'] > summary_df['sma_50']
-        summary_df['above_200_ma'] = summary_df['latest_close'] > summary_df['sma_200']
+        # Compared while close and the moving averages are both still float32, so a close equal to
+        # its average stays equal rather than tipping either way on the widening below.
+        summary_df[['above_20_ma', 'above_50_ma', 'above_200_ma']] = (
+            summary_df[['sma_20', 'sma_50', 'sma_200']].to_numpy() < summary_df['latest_close'].to_numpy()[:, None]
+        )
+        # Closes are stored with two decimals; undo the float32 representation error for the report.
+        summary_df['latest_close'] = summary_df['latest_close'].astype(np.float64).round(2)
         summary_df['symbol'] = summary_df.index
-        summary_df['data_start_date'] = weekly_df.groupby('ticker')['date'].min()
-        summary_df['latest_date'] = weekly_df.groupby('ticker')['date'].max()
+        weekly_date_range = weekly_by_ticker['date'].agg(['min', 'max'])
+        summary_df['data_start_date'] = weekly_date_range['min']
+        summary_df['latest_date'] = weekly_date_range['max']
         summary_df['data_days_available'] = (summary_df['latest_date'] - summary_df['data_start_date']).dt.days
 
         logging.info("✅ Vectorized analysis complete.")
@@ -183,22 +297,35 @@ class USMarketAnalyzer:
         for col in score_cols:
             df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
 
-        def z_score(series: pd.Series) -> pd.Series:
-            std_dev = series.std(ddof=0)
-            if std_dev != 0:
-                return (series - series.mean()) / std_dev
-            else:
-                return pd.Series(0, index=series.index, dtype=float)
-
-        for col in ['rs_3m_change', 'rs_6m_change', 'rs_12m_change', 'volume_strength']:
-            df[f'z_{col.replace("_change", "")}'] = z_score(df[col])
+        # Z-score all score columns in one block; a zero-variance column scores 0 throughout.
+        block = df[score_cols].to_numpy(dtype=np.float64)
+        deviations = block - block.mean(axis=0)
+        std_devs = block.std(axis=0)
+        z_scores = np.divide(deviations, std_devs, out=np.zeros_like(block), where=std_devs != 0)
+        df[[f'z_{col.replace("_change", "")}' for col in score_cols]] = z_scores
             
         df['momentum_score_z'] = (0.5 * df['z_rs_3m'] + 0.3 * df['z_rs_6m'] + 0.2 * df['z_rs_12m'])
         df['rank_position'] = df['momentum_score_z'].rank(ascending=False, method='min').astype(int)
-        df['category'] = pd.cut(df['rank_position'], bins=[0, 20, 50, np.inf], labels=['Top Pick', 'Watchlist', 'Lagging'], right=True)
+        # Ranks start at 1, so two threshold compares give the same buckets as binning on (0, 20], (20, 50], (50, inf).
+        ranks = df['rank_position'].to_numpy()
+        df['category'] = pd.Categorical(
+            np.where(ranks <= 20, 'Top Pick', np.where(ranks <= 50, 'Watchlist', 'Lagging')),
+            categories=['Top Pick', 'Watchlist', 'Lagging'], ordered=True
+        )
         
         return df
 
+    def write_sheet_rows(self, writer: pd.ExcelWriter, df: pd.DataFrame, sheet_name: str, header_format=None) -> None:
+        """Write a DataFrame to a new worksheet strictly row by row."""
+        # xlsxwriter's constant_memory mode flushes each row once the next one starts, so cells
+        # must arrive in row-major order; DataFrame.to_excel emits them column by column.
+        worksheet = writer.book.add_worksheet(sheet_name)
+        worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+        values = df.astype(object)
+        values = values.where(values.notna(), None)
+        for row_idx, row in enumerate(values.itertuples(index=False, name=None), start=1):
+            worksheet.write_row(row_idx, 0, row)
+
     def export_to_excel(self, summary_df: pd.DataFrame, output_file: str) -> bool:
         """Export the full analysis to a multi-sheet Excel file."""
         if summary_df.empty:
@@ -206,28 +333,39 @@ class USMarketAnalyzer:
             return False
         logging.info(f"Exporting comprehensive results to {output_file}...")
         try:
-            with pd.ExcelWriter(output_file, engine='xlsxwriter') as writer:
+            excel_options = {'constant_memory': True, 'strings_to_numbers': False}
+            with pd.ExcelWriter(output_file, engine='xlsxwriter', engine_kwargs={'options': excel_options}) as writer:
+                # Same header style DataFrame.to_excel applies.
+                header_format = writer.book.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
                 export_cols = [
                     'rank_position', 'symbol', 'sector', 'industry', 'latest_close', 
                     'rs_3m_change', 'rs_6m_change', 'rs_12m_change', 'rs_trend', 'volume_strength',
                     'momentum_score_z', 'category', 'above_20_ma', 'above_50_ma', 'above_200_ma'
                 ]
                 export_df = summary_df[[col for col in export_cols if col in summary_df.columns]].sort_values('rank_position').reset_index(drop=True)
-                export_df.to_excel(writer, sheet_name="RS_Analysis", index=False)
+                self.write_sheet_rows(writer, export_df, "RS_Analysis", header_format)
                 
                 total_stocks = len(summary_df)
+                # All breadth counts come from one block reduction instead of a
+                # separate full-column comparison and sum per metric.
+                is_uptrend = (summary_df['rs_trend'] == 'Uptrend').to_numpy()
                 if total_stocks > 0:
+                    uptrend, above_200, above_50, above_20 = np.column_stack([
+                        is_uptrend, summary_df[['above_200_ma', 'above_50_ma', 'above_20_ma']].to_numpy(dtype=bool)
+                    ]).sum(axis=0)
+                    category_counts = summary_df['category'].value_counts()
+                    pct = lambda count: f"{(count / total_stocks * 100):.1f}%"
                     breadth_metrics = {
                         'Metric': ['Total Stocks Analyzed', 'Stocks in RS Uptrend', '% Stocks in RS Uptrend', 'Stocks Above 200-Day MA', '% Stocks Above 200-Day MA', 'Stocks Above 50-Day MA', '% Stocks Above 50-Day MA', 'Stocks Above 20-Day MA', '% Stocks Above 20-Day MA', 'Top Pick Count', 'Watchlist Count', 'Lagging Count'],
-                        'Value': [total_stocks, (summary_df['rs_trend'] == 'Uptrend').sum(), f"{((summary_df['rs_trend'] == 'Uptrend').sum() / total_stocks * 100):.1f}%", summary_df['above_200_ma'].sum(), f"{(summary_df['above_200_ma'].sum() / total_stocks * 100):.1f}%", summary_df['above_50_ma'].sum(), f"{(summary_df['above_50_ma'].sum() / total_stocks * 100):.1f}%", summary_df['above_20_ma'].sum(), f"{(summary_df['above_20_ma'].sum() / total_stocks * 100):.1f}%", (summary_df['category'] == 'Top Pick').sum(), (summary_df['category'] == 'Watchlist').sum(), (summary_df['category'] == 'Lagging').sum()]
+                        'Value': [total_stocks, uptrend, pct(uptrend), above_200, pct(above_200), above_50, pct(above_50), above_20, pct(above_20), category_counts.get('Top Pick', 0), category_counts.get('Watchlist', 0), category_counts.get('Lagging', 0)]
                     }
-                    pd.DataFrame(breadth_metrics).to_excel(writer, sheet_name="Market_Breadth", index=False)
+                    self.write_sheet_rows(writer, pd.DataFrame(breadth_metrics), "Market_Breadth", header_format)
 
-                sector_agg = summary_df.groupby('sector').agg(
+                sector_agg = summary_df.assign(is_uptrend=is_uptrend).groupby('sector', observed=True).agg(
                     Avg_Momentum_Score=('momentum_score_z', 'mean'), Stock_Count=('symbol', 'count'),
-                    Uptrend_Count=('rs_trend', lambda x: (x == 'Uptrend').sum())
+                    Uptrend_Count=('is_uptrend', 'sum')
                 ).round(2).reset_index().sort_values('Avg_Momentum_Score', ascending=False)
-                sector_agg.to_excel(writer, sheet_name="Sector_Analysis", index=False)
+                self.write_sheet_rows(writer, sector_agg, "Sector_Analysis", header_format)
             
             logging.info(f"✅ Results exported to {output_file}")
             return True
@@ -248,6 +386,9 @@ class USMarketAnalyzer:
         if master_df is None or master_df.empty: return False
             
         summary_df = self.run_vectorized_analysis(master_df)
+        # The long daily frame dominates peak memory; drop it before scoring and Excel export.
+        del master_df
+        gc.collect()
         if summary_df is None or summary_df.empty:
             logging.error("❌ Analysis produced no results."); return False
 
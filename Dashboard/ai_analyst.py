@@ -4,10 +4,35 @@ import os
 import google.generativeai as genai
 import pandas as pd
 import logging
+from functools import lru_cache
 from dotenv import load_dotenv
 
 load_dotenv()
 
+PROMPT_TEMPLATE = """
+**Your Role:** You are a sharp, no-fluff market strategist.
+**Your Task:** Synthesize the provided market health indicators into a concise summary.
+**Instructions:**
+1.  Begin with a one-sentence "Bottom Line" conclusion.
+2.  Analyze both the current value and the 1-week trend for each indicator.
+3.  If a key indicator's value is "Unavailable", you MUST state this clearly and explain that it creates a blind spot in the analysis. This is a critical risk to highlight.
+4.  Synthesize the available data. Do not just list it. Explain what the combination of indicators implies for overall market health.
+5.  Keep the entire summary to three short paragraphs.
+
+**Data to Analyze:**
+{data_context}
+
+**Begin Analysis:**
+"""
+
+
+@lru_cache(maxsize=1)
+def _get_model(api_key: str):
+    """Configures the Gemini client once and reuses the model across dashboard callbacks."""
+    genai.configure(api_key=api_key) # type: ignore
+    return genai.GenerativeModel('gemini-2.5-pro') # type: ignore
+
+
 def get_trend_word(change, positive_is_good=True):
     """Helper function to describe a trend."""
     if pd.isna(change):
@@ -27,18 +52,18 @@ def generate_market_summary(breadth_for_ai: pd.DataFrame, indicators_df: pd.Data
         logging.error("❌ Gemini API key not found in environment variables. Please set GEMINI_API_KEY.")
         return "Error: The `GEMINI_API_KEY` environment variable is not set."
 
-    try:
-        genai.configure(api_key=api_key) # type: ignore
-        model = genai.GenerativeModel('gemini-2.5-pro') # type: ignore
+    if len(breadth_for_ai) < 6 or len(indicators_df) < 6:
+        return "Error: Not enough historical data to generate a trend analysis (need at least 6 days)."
 
-        if len(breadth_for_ai) < 6 or len(indicators_df) < 6:
-            return "Error: Not enough historical data to generate a trend analysis (need at least 6 days)."
+    try:
+        model = _get_model(api_key)
 
         latest_breadth = breadth_for_ai.iloc[-1]
         prev_breadth = breadth_for_ai.iloc[0]
         
-        latest_indicators = indicators_df.iloc[-1]
-        prev_indicators = indicators_df.iloc[-6]
+        # Plain dicts keep the repeated lookups below out of pandas' label indexing.
+        latest_indicators = indicators_df.iloc[-1].to_dict()
+        prev_indicators = indicators_df.iloc[-6].to_dict()
 
         breadth_200_change = latest_breadth['pct_above_200'] - prev_breadth['pct_above_200']
         
@@ -61,21 +86,7 @@ def generate_market_summary(breadth_for_ai: pd.DataFrame, indicators_df: pd.Data
         """
         # --- END OF FIX ---
 
-        prompt = f"""
-        **Your Role:** You are a sharp, no-fluff market strategist.
-        **Your Task:** Synthesize the provided market health indicators into a concise summary.
-        **Instructions:**
-        1.  Begin with a one-sentence "Bottom Line" conclusion.
-        2.  Analyze both the current value and the 1-week trend for each indicator.
-        3.  If a key indicator's value is "Unavailable", you MUST state this clearly and explain that it creates a blind spot in the analysis. This is a critical risk to highlight.
-        4.  Synthesize the available data. Do not just list it. Explain what the combination of indicators implies for overall market health.
-        5.  Keep the entire summary to three short paragraphs.
-
-        **Data to Analyze:**
-        {data_context}
-
-        **Begin Analysis:**
-        """
+        prompt = PROMPT_TEMPLATE.format(data_context=data_context)
 
         response = model.generate_content(prompt)
         return response.text
@@ -1,8 +1,12 @@
-from dash import Input, Output, callback, ctx, dcc, html, State
+from dash import Input, Output, callback, ctx, dcc, html, State, Patch
 from dash.exceptions import PreventUpdate
 import pandas as pd
+import numpy as np
 from datetime import timedelta
+from functools import lru_cache
+from sqlalchemy import text
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 from dash_bootstrap_templates import ThemeSwitchAIO
 from Dashboard.data import latest_date
@@ -12,12 +16,15 @@ import logging
 from Dashboard.app import app
 # REFACTORED IMPORTS: Removed breadth_df/trend_pct_df, added engine
 from Dashboard.data import (
-    engine, market_indicators_df, spx_df, latest_df, total_stocks_latest,
-    breakout_stocks_df, stock_metadata_df
+    engine, market_indicators_df, spx_df, gauge_percentages,
+    stock_metadata_df, read_sql_copy
 )
 from Dashboard.ai_analyst import generate_market_summary
 
-# --- Gauge and Modal Callbacks (No changes) ---
+# --- Gauge and Modal Callbacks ---
+# Gauge values are fixed for the life of the process, so each (value, theme) figure is
+# built and converted to its JSON dict only once.
+@lru_cache(maxsize=None)
 def create_themed_gauge(value, template):
     fig = go.Figure(go.Indicator(
         mode="gauge+number", value=round(value, 1),
@@ -26,7 +33,7 @@ def create_themed_gauge(value, template):
                'steps': [{'range': [0, 30], 'color': '#d62728'}, {'range': [30, 70], 'color': '#ff7f0e'}, {'range': [70, 100], 'color': '#2ca02c'}]}
     ))
     fig.update_layout(height=250, margin=dict(t=50, b=10, l=10, r=10), template=template)
-    return fig
+    return fig.to_plotly_json()
 
 @callback(
     Output('gauge-ma20', 'figure'),
@@ -36,13 +43,16 @@ def create_themed_gauge(value, template):
 )
 def update_gauges(toggle_on):
     template = "plotly_dark" if toggle_on else "plotly_white"
-    if total_stocks_latest > 0:
-        pct_above_ma20 = 100 * (latest_df['adj_close'] > latest_df['ma_20']).sum() / total_stocks_latest
-        pct_above_ma50 = 100 * (latest_df['adj_close'] > latest_df['ma_50']).sum() / total_stocks_latest
-        pct_above_ma200 = 100 * (latest_df['adj_close'] > latest_df['ma_200']).sum() / total_stocks_latest
-    else:
-        pct_above_ma20 = pct_above_ma50 = pct_above_ma200 = 0
-    return create_themed_gauge(pct_above_ma20, template), create_themed_gauge(pct_above_ma50, template), create_themed_gauge(pct_above_ma200, template)
+    return tuple(create_themed_gauge(gauge_percentages[ma], template) for ma in ('ma_20', 'ma_50', 'ma_200'))
+
+# The modal only ever shows one day, so its stocks are fetched when a bar is clicked rather
+# than holding the whole breakout history in memory; the (date, ticker) primary key serves the lookup.
+BREAKOUT_STOCKS_QUERY = text("SELECT date, ticker FROM daily_breakout_stocks WHERE date = :date")
+
+@lru_cache(maxsize=64)
+def load_breakout_stocks(clicked_date):
+    if not engine: return pd.DataFrame(columns=['date', 'ticker'])
+    return pd.read_sql_query(BREAKOUT_STOCKS_QUERY, engine, params={'date': clicked_date}, parse_dates=['date'])
 
 @callback(
     Output("breakout-modal", "is_open"),
@@ -58,13 +68,13 @@ def toggle_breakout_modal(clickData, close_clicks, is_open):
     if triggered_id == 'breakout-chart' and clickData:
         clicked_date_str = clickData["points"][0]["x"]
         clicked_date = pd.to_datetime(clicked_date_str).date()
-        stocks_on_day = breakout_stocks_df[breakout_stocks_df['date'].dt.date == clicked_date]
+        stocks_on_day = load_breakout_stocks(clicked_date)
         title = f"Breakout Stocks for {clicked_date.strftime('%Y-%m-%d')}"
         if stocks_on_day.empty:
             body = html.P("No specific breakout stocks recorded for this day.")
         else:
             merged_df = pd.merge(stocks_on_day, stock_metadata_df, on='ticker')
-            grouped_by_sector = merged_df.groupby('sector')
+            grouped_by_sector = merged_df.groupby('sector', observed=True)
             total_stocks, total_sectors, total_industries = len(merged_df), len(grouped_by_sector), merged_df['industry'].nunique()
             summary = html.P(f"Total: {total_stocks} stocks across {total_sectors} sectors and {total_industries} industries.", className="mb-4")
             sector_tables = []
@@ -72,7 +82,8 @@ def toggle_breakout_modal(clickData, close_clicks, is_open):
             for sector_name, sector_df in sorted_sectors:
                 sector_header = html.H4(f"{sector_name} ({len(sector_df)} stocks)", className="mt-4")
                 table_header = [html.Thead(html.Tr([html.Th("Ticker"), html.Th("Industry")]))]
-                table_rows = [html.Tr([html.Td(row['ticker']), html.Td(row['industry'])]) for i, row in sector_df.sort_values(by=['industry', 'ticker']).iterrows()]
+                sorted_sector_df = sector_df.sort_values(by=['industry', 'ticker'])
+                table_rows = [html.Tr([html.Td(ticker), html.Td(industry)]) for ticker, industry in zip(sorted_sector_df['ticker'].to_numpy(), sorted_sector_df['industry'].to_numpy())]
                 table_body = [html.Tbody(table_rows)]
                 sector_table = dbc.Table(table_header + table_body, bordered=False, hover=True, striped=True, className="small")
                 sector_tables.extend([sector_header, sector_table])
@@ -82,6 +93,77 @@ def toggle_breakout_modal(clickData, close_clicks, is_open):
         return False, "", ""
     return is_open, "", ""
 
+# --- Historical Breadth & Trend Data ---
+# Bound parameters keep the SQL text constant across date ranges, and the memoized loader
+# turns repeated preset-button clicks into in-memory lookups. Like the rest of the
+# dashboard's data, results live for the lifetime of the process.
+# Breadth and trend composition are pre-aggregated per date into daily_breadth by the
+# analytics pipeline, so a chart range is a single indexed range scan.
+HISTORICAL_QUERY = text("""
+SELECT
+    date, pct_above_20, pct_above_50, pct_above_200,
+    pct_uptrend AS "Uptrend", pct_sideways AS "Sideways", pct_downtrend AS "Downtrend"
+FROM daily_breadth
+WHERE date BETWEEN :start_date AND :end_date
+ORDER BY date;
+""")
+
+# Long custom ranges can span thousands of trading days; the browser gains nothing from
+# more points than the chart is wide, so each series is thinned to an evenly spaced subset
+# (always keeping the first and last day) before it is serialized.
+MAX_CHART_POINTS = 1000
+
+def thin_for_chart(df, max_points=MAX_CHART_POINTS):
+    if len(df) <= max_points:
+        return df
+    positions = np.unique(np.linspace(0, len(df) - 1, max_points).round().astype(int))
+    return df.iloc[positions]
+
+# Every non-date column is a percentage, so the CSV parser is told so up front instead of
+# sniffing each column's type.
+HISTORICAL_DTYPES = {c: 'float64' for c in ['pct_above_20', 'pct_above_50', 'pct_above_200', 'Uptrend', 'Sideways', 'Downtrend']}
+
+@lru_cache(maxsize=32)
+def load_historical_frames(start_date_sql, end_date_sql):
+    """Returns the breadth and trend-composition frames for a date range."""
+    params = {'start_date': start_date_sql, 'end_date': end_date_sql}
+    historical_df = thin_for_chart(read_sql_copy(HISTORICAL_QUERY, params, index_col='date', parse_dates=['date'], dtype=HISTORICAL_DTYPES))
+    breadth_df = historical_df[['pct_above_20', 'pct_above_50', 'pct_above_200']]
+    trend_pct_df = historical_df[['Uptrend', 'Sideways', 'Downtrend']]
+    return breadth_df, trend_pct_df
+
+@lru_cache(maxsize=1)
+def get_max_analytics_date():
+    """Latest analytics date, probed once; the dashboard's data is fixed after startup."""
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT MAX(date) FROM daily_stock_analytics")).scalar()
+
+# Figures are converted to plain JSON dicts once per (range, theme) and memoized, so repeated
+# ranges skip both the plotly figure validation and its to-dict conversion.
+@lru_cache(maxsize=32)
+def build_historical_figures(start_date_dt, end_date_dt, template):
+    start_date_sql = start_date_dt.strftime('%Y-%m-%d')
+    end_date_sql = end_date_dt.strftime('%Y-%m-%d')
+
+    filtered_breadth_df, filtered_trend_df = load_historical_frames(start_date_sql, end_date_sql)
+    
+    breadth_fig = go.Figure(layout=dict(template=template, legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)))
+    breadth_fig.add_traces([go.Scattergl(x=filtered_breadth_df.index, y=filtered_breadth_df[c], name=n) for c, n in [('pct_above_20', '% > 20D MA'), ('pct_above_50', '% > 50D MA'), ('pct_above_200', '% > 200D MA')]])
+    breadth_fig.update_layout(title="Historical Market Breadth", yaxis_range=[0, 100])
+
+    filtered_indicators_df = thin_for_chart(market_indicators_df.loc[start_date_dt:end_date_dt])
+    filtered_spx_df = thin_for_chart(spx_df.loc[start_date_dt:end_date_dt])
+    ad_fig = make_subplots(specs=[[{"secondary_y": True}]])
+    ad_fig.add_trace(go.Scattergl(x=filtered_spx_df.index, y=filtered_spx_df['hlcc4'], name="S&P 500 Price"), secondary_y=False)
+    ad_fig.add_trace(go.Scattergl(x=filtered_indicators_df.index, y=filtered_indicators_df['ad_line'], name="A/D Line"), secondary_y=True)
+    ad_fig.update_layout(template=template, title_text="S&P 500 vs. Advance/Decline Line", legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+
+    trend_fig = go.Figure(layout=dict(template=template, yaxis=dict(range=[0, 100], ticksuffix='%'), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)))
+    trend_fig.add_traces([go.Scatter(x=filtered_trend_df.index, y=filtered_trend_df.get(c, pd.Series(dtype='float64')), name=n, stackgroup='one', line=dict(color=co), fillcolor=fco) for c, n, co, fco in [('Uptrend', 'Uptrend', 'rgba(39, 174, 96, 0.8)', 'rgba(39, 174, 96, 0.5)'), ('Sideways', 'Sideways', 'rgba(243, 156, 18, 0.8)', 'rgba(243, 156, 18, 0.5)'), ('Downtrend', 'Downtrend', 'rgba(231, 76, 60, 0.8)', 'rgba(231, 76, 60, 0.5)')]])
+    trend_fig.update_layout(title_text="Market Trend Composition")
+
+    return breadth_fig.to_plotly_json(), ad_fig.to_plotly_json(), trend_fig.to_plotly_json()
+
 # --- REFACTORED HISTORICAL CHARTS CALLBACK ---
 @callback(
     Output('historical-breadth-chart', 'figure'),
@@ -93,7 +175,7 @@ def toggle_breakout_modal(clickData, close_clicks, is_open):
     [Input(f"btn-{text.lower()}", 'n_clicks') for text in ["1M", "3M", "6M", "1Y", "2Y"]],
     Input('date-picker-range', 'start_date'),
     Input('date-picker-range', 'end_date'),
-    Input(ThemeSwitchAIO.ids.switch("theme"), "value")
+    State(ThemeSwitchAIO.ids.switch("theme"), "value")
 )
 def update_historical_charts(*args):
     toggle_on = args[-1]
@@ -107,9 +189,8 @@ def update_historical_charts(*args):
     if not engine:
         return empty_fig, empty_fig, empty_fig, None, None, *active_buttons
 
-    max_date_query = "SELECT MAX(date) FROM daily_stock_analytics"
     try:
-        max_date = pd.read_sql(max_date_query, engine).iloc[0, 0]
+        max_date = get_max_analytics_date()
         if max_date is None or pd.isna(max_date):
             return empty_fig, empty_fig, empty_fig, None, None, *active_buttons
     except Exception:
@@ -127,60 +208,23 @@ def update_historical_charts(*args):
         end_date_dt = pd.to_datetime(max_date) # type: ignore
         start_date_dt = end_date_dt - timedelta(days=days.get(button_id, 365))
 
-    start_date_sql = start_date_dt.strftime('%Y-%m-%d')
-    end_date_sql = end_date_dt.strftime('%Y-%m-%d')
-
-    # --- THIS IS THE FIX: Specify d.date or a.date ---
-    breadth_query = f"""
-    WITH daily_stats AS (
-        SELECT
-            d.date, -- Changed from 'date' to 'd.date'
-            COUNT(*) AS total,
-            SUM(CASE WHEN d.adj_close > a.ma_200 THEN 1 ELSE 0 END) AS above_200,
-            SUM(CASE WHEN d.adj_close > a.ma_50 THEN 1 ELSE 0 END) AS above_50,
-            SUM(CASE WHEN d.adj_close > a.ma_20 THEN 1 ELSE 0 END) AS above_20
-        FROM daily_stock_data d
-        JOIN daily_stock_analytics a ON d.ticker = a.ticker AND d.date = a.date
-        WHERE d.date BETWEEN '{start_date_sql}' AND '{end_date_sql}'
-        GROUP BY d.date -- Changed from 'date' to 'd.date'
-    )
-    SELECT
-        date,
-        100.0 * above_20 / total AS pct_above_20,
-        100.0 * above_50 / total AS pct_above_50,
-        100.0 * above_200 / total AS pct_above_200
-    FROM daily_stats
-    ORDER BY date;
-    """
-    # --- END OF FIX ---
-    
-    filtered_breadth_df = pd.read_sql_query(breadth_query, engine, index_col='date', parse_dates=['date'])
-    
-    breadth_fig = go.Figure(layout=dict(template=template, legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)))
-    breadth_fig.add_traces([go.Scatter(x=filtered_breadth_df.index, y=filtered_breadth_df[c], name=n) for c, n in [('pct_above_20', '% > 20D MA'), ('pct_above_50', '% > 50D MA'), ('pct_above_200', '% > 200D MA')]])
-    breadth_fig.update_layout(title="Historical Market Breadth", yaxis_range=[0, 100])
-
-    filtered_indicators_df = market_indicators_df.loc[start_date_dt:end_date_dt]
-    filtered_spx_df = spx_df.loc[start_date_dt:end_date_dt]
-    ad_fig = make_subplots(specs=[[{"secondary_y": True}]])
-    ad_fig.add_trace(go.Scatter(x=filtered_spx_df.index, y=filtered_spx_df['hlcc4'], name="S&P 500 Price"), secondary_y=False)
-    ad_fig.add_trace(go.Scatter(x=filtered_indicators_df.index, y=filtered_indicators_df['ad_line'], name="A/D Line"), secondary_y=True)
-    ad_fig.update_layout(template=template, title_text="S&P 500 vs. Advance/Decline Line", legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
-
-    trend_query = f"""
-    SELECT date, trend, COUNT(ticker) as count FROM daily_stock_analytics
-    WHERE date BETWEEN '{start_date_sql}' AND '{end_date_sql}' GROUP BY date, trend ORDER BY date;
-    """
-    trend_df = pd.read_sql_query(trend_query, engine, parse_dates=['date'])
-    trend_pivot = trend_df.pivot(index='date', columns='trend', values='count').fillna(0)
-    filtered_trend_df = (100 * trend_pivot.div(trend_pivot.sum(axis=1), axis=0))
-
-    trend_fig = go.Figure(layout=dict(template=template, yaxis=dict(range=[0, 100], ticksuffix='%'), legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)))
-    trend_fig.add_traces([go.Scatter(x=filtered_trend_df.index, y=filtered_trend_df.get(c, pd.Series(dtype='float64')), name=n, stackgroup='one', line=dict(color=co), fillcolor=fco) for c, n, co, fco in [('Uptrend', 'Uptrend', 'rgba(39, 174, 96, 0.8)', 'rgba(39, 174, 96, 0.5)'), ('Sideways', 'Sideways', 'rgba(243, 156, 18, 0.8)', 'rgba(243, 156, 18, 0.5)'), ('Downtrend', 'Downtrend', 'rgba(231, 76, 60, 0.8)', 'rgba(231, 76, 60, 0.5)')]])
-    trend_fig.update_layout(title_text="Market Trend Composition")
-
+    breadth_fig, ad_fig, trend_fig = build_historical_figures(start_date_dt, end_date_dt, template)
     return breadth_fig, ad_fig, trend_fig, start_date_dt.date(), end_date_dt.date(), *active_buttons
 
+# Theme changes only swap the figure template, so the data callback above (and its
+# queries) is not re-run; the patch leaves the traces already in the browser untouched.
+@callback(
+    Output('historical-breadth-chart', 'figure', allow_duplicate=True),
+    Output('ad-line-chart', 'figure', allow_duplicate=True),
+    Output('trend-composition-chart', 'figure', allow_duplicate=True),
+    Input(ThemeSwitchAIO.ids.switch("theme"), "value"),
+    prevent_initial_call=True
+)
+def restyle_historical_charts(toggle_on):
+    patched_fig = Patch()
+    patched_fig['layout']['template'] = pio.templates["plotly_dark" if toggle_on else "plotly_white"]
+    return patched_fig, patched_fig, patched_fig
+
 # --- Breakout Chart Callback (No changes) ---
 @callback(
     Output('breakout-chart', 'figure'),
@@ -192,14 +236,18 @@ def update_breakout_chart(start_date, end_date, toggle_on):
     template = "plotly_dark" if toggle_on else "plotly_white"
     if market_indicators_df.empty or not start_date or not end_date:
         return go.Figure().update_layout(title_text="Not Enough Data", template=template)
+    return build_breakout_figure(start_date, end_date, template)
+
+@lru_cache(maxsize=32)
+def build_breakout_figure(start_date, end_date, template):
     filtered_df = market_indicators_df.loc[start_date:end_date]
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     fig.add_trace(go.Bar(x=filtered_df.index, y=filtered_df['high_volume_breakout_count'], name='Breakout Count'), secondary_y=False)
-    fig.add_trace(go.Scatter(x=filtered_df.index, y=filtered_df['pct_above_avg_volume'], name='% Above Avg. Volume'), secondary_y=True)
+    fig.add_trace(go.Scattergl(x=filtered_df.index, y=filtered_df['pct_above_avg_volume'], name='% Above Avg. Volume'), secondary_y=True)
     fig.update_layout(template=template, legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
     fig.update_yaxes(title_text="Breakout Count", secondary_y=False)
     fig.update_yaxes(title_text="% Stocks > Avg. Volume", secondary_y=True)
-    return fig
+    return fig.to_plotly_json()
 
 # --- Macro Chart Callback (No changes) ---
 @callback(
@@ -212,11 +260,15 @@ def update_macro_chart(start_date, end_date, toggle_on):
     template = "plotly_dark" if toggle_on else "plotly_white"
     if market_indicators_df.empty or spx_df.empty or not start_date or not end_date:
         return go.Figure().update_layout(title_text="No Macro Data Loaded", template=template)
+    return build_macro_figure(start_date, end_date, template)
+
+@lru_cache(maxsize=32)
+def build_macro_figure(start_date, end_date, template):
     filtered_df = market_indicators_df.loc[start_date:end_date]
     filtered_spx = spx_df.loc[start_date:end_date]
     fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.1, row_heights=[0.7, 0.3], specs=[[{"secondary_y": True}], [{}]])
-    fig.add_trace(go.Scatter(x=filtered_spx.index, y=filtered_spx['hlcc4'], name="S&P 500 Price"), row=1, col=1, secondary_y=False)
-    fig.add_trace(go.Scatter(x=filtered_df.index, y=filtered_df['dff'], name="Fed Funds Rate (%)"), row=1, col=1, secondary_y=True)
+    fig.add_trace(go.Scattergl(x=filtered_spx.index, y=filtered_spx['hlcc4'], name="S&P 500 Price"), row=1, col=1, secondary_y=False)
+    fig.add_trace(go.Scattergl(x=filtered_df.index, y=filtered_df['dff'], name="Fed Funds Rate (%)"), row=1, col=1, secondary_y=True)
     bar_data = filtered_df['t10y2y'].dropna()
     if not bar_data.empty:
         colors = ['#d62728' if x < 0 else '#2ca02c' for x in bar_data]
@@ -228,9 +280,22 @@ def update_macro_chart(start_date, end_date, toggle_on):
     fig.update_yaxes(title_text="10Y-2Y Spread", row=2, col=1)
     fig.update_xaxes(title_text="Date", row=2, col=1)
     fig.update_xaxes(showticklabels=False, row=1, col=1)
-    return fig
+    return fig.to_plotly_json()
 
 # --- REFACTORED AI SUMMARY CALLBACK ---
+# The last six days of breadth come straight from the pre-aggregated daily_breadth table.
+AI_BREADTH_QUERY = text("""
+SELECT date, pct_above_50, pct_above_200
+FROM daily_breadth
+ORDER BY date DESC
+LIMIT 6;
+""")
+
+@lru_cache(maxsize=1)
+def load_ai_breadth():
+    """Most recent six days of breadth in date order; fixed for the life of the process."""
+    return read_sql_copy(AI_BREADTH_QUERY, index_col='date', parse_dates=['date']).sort_index()
+
 @callback(
     Output("ai-summary-output-container", "children"),
     Input("generate-ai-summary-btn", "n_clicks"),
@@ -240,25 +305,8 @@ def update_ai_summary(n_clicks):
     if n_clicks is None or n_clicks < 1 or not engine:
         raise PreventUpdate
 
-    # --- THIS IS THE FIX: Specify d.date to resolve ambiguity ---
-    breadth_query = """
-    WITH date_calcs AS (
-        SELECT
-            d.date, -- Changed from 'date'
-            100.0 * SUM(CASE WHEN d.adj_close > a.ma_50 THEN 1 ELSE 0 END) / COUNT(*) as pct_above_50,
-            100.0 * SUM(CASE WHEN d.adj_close > a.ma_200 THEN 1 ELSE 0 END) / COUNT(*) as pct_above_200
-        FROM daily_stock_data d
-        JOIN daily_stock_analytics a ON d.ticker = a.ticker AND d.date = a.date
-        GROUP BY d.date -- Changed from 'date'
-        ORDER BY d.date DESC
-        LIMIT 6
-    )
-    SELECT * FROM date_calcs ORDER BY date ASC;
-    """
-    # --- END OF FIX ---
-    
     try:
-        breadth_for_ai = pd.read_sql_query(breadth_query, engine, index_col='date', parse_dates=['date'])
+        breadth_for_ai = load_ai_breadth()
         
         if len(breadth_for_ai) < 6:
             return html.P("Not enough historical data to generate trend analysis.", className="text-warning")
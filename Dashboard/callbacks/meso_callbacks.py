@@ -1,14 +1,19 @@
-from dash import Input, Output, callback, dcc, html, ALL, ctx, State
+from dash import Input, Output, callback, dcc, html, ALL, ctx, State, Patch
 from dash.exceptions import PreventUpdate
 import plotly.graph_objects as go
+import plotly.io as pio
 from dash_bootstrap_templates import ThemeSwitchAIO
-from Dashboard.data import latest_stock_analytics_df
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 import pandas as pd
+import numpy as np
+from functools import lru_cache
 
 from Dashboard.app import app
-from Dashboard.data import group_analytics_df, industry_to_sector_map # Import the new map
+from Dashboard.data import (
+    get_group_analytics, get_group_snapshot, get_group_history, get_industry_to_sector_map,
+    get_latest_stock_analytics, get_rs_leaders_top25
+)
 
 def create_stat_card(label, value, status_class=""):
     return dbc.Col(dbc.Card([dbc.CardHeader(label, className="text-center small"), dbc.CardBody(html.H4(value, className=f"text-center {status_class}"))]), className="mb-2")
@@ -21,6 +26,7 @@ def get_status_class(value, threshold_bull, threshold_bear):
 
 @callback(Output('group-select-dropdown', 'options'), Input('analysis-mode-toggle', 'value'))
 def update_dropdown_options(analysis_mode):
+    group_analytics_df = get_group_analytics().df
     if group_analytics_df.empty: return []
     return sorted(group_analytics_df[group_analytics_df['group_type'] == analysis_mode]['group_name'].unique())
 
@@ -31,11 +37,21 @@ def update_dropdown_options(analysis_mode):
     Input('analysis-mode-toggle', 'value')
 )
 def set_initial_date_picker_state(analysis_mode):
+    group_analytics_df = get_group_analytics().df
     if group_analytics_df.empty: return None, None, None, None, None
     min_date, max_date = group_analytics_df['analysis_date'].min().date(), group_analytics_df['analysis_date'].max().date()
     start_date = (pd.to_datetime(max_date) - pd.DateOffset(years=1)).date()
     return min_date, max_date, max_date, start_date, max_date
 
+# Detail charts are memoized as plain JSON dicts per (group, range, theme), so revisiting a
+# group skips rebuilding and validating the plotly figures.
+@lru_cache(maxsize=64)
+def build_group_figures(analysis_mode, selected_group, range_start, range_end, template):
+    group_df = get_group_history(analysis_mode, selected_group, range_start.to_datetime64(), range_end.to_datetime64())
+    rs_fig = go.Figure(layout={'template':template,'height':350}).add_traces([go.Scattergl(x=group_df['analysis_date'], y=group_df[c], name=n, line=dict(color=co, dash=d)) for c,n,co,d in [('group_rs_value','Group RS','#1f77b4','solid'),('group_rs_sma_200','200D SMA','#d62728','dot'),('group_rs_sma_50','50D SMA','#2ca02c','dot')]]).update_layout(title="<b>RS Trend</b>", margin=dict(t=30,b=10), legend=dict(orientation="h",yanchor="bottom",y=1.02,xanchor="right",x=1))
+    momentum_fig = go.Figure(layout={'template':template,'height':350}).add_trace(go.Bar(x=group_df['analysis_date'],y=group_df['group_rs_roc_20'],name='20D ROC',marker_color=["#2ca02c" if x>=0 else "#d62728" for x in group_df['group_rs_roc_20']])).update_layout(title="<b>RS Momentum (ROC)</b>", margin=dict(t=30,b=10), yaxis_ticksuffix='%')
+    return rs_fig.to_plotly_json(), momentum_fig.to_plotly_json()
+
 @callback(
     Output('meso-main-title', 'children'), Output('meso-main-subtitle', 'children'),
     Output('group-select-label', 'children'), Output('heatmap-container', 'style'),
@@ -45,17 +61,20 @@ def set_initial_date_picker_state(analysis_mode):
     Output('rs-chart', 'figure'), Output('momentum-chart', 'figure'),
     Input('analysis-mode-toggle', 'value'), Input('group-select-dropdown', 'value'),
     Input('meso-date-picker-range', 'start_date'), Input('meso-date-picker-range', 'end_date'),
-    Input(ThemeSwitchAIO.ids.switch("theme"), "value")
+    State(ThemeSwitchAIO.ids.switch("theme"), "value")
 )
 def update_meso_view(analysis_mode, selected_group, start_date, end_date, toggle_on):
     template = "plotly_dark" if toggle_on else "plotly_white"
-    if group_analytics_df.empty:
+    group_analysis_dates = get_group_analytics().dates
+    if len(group_analysis_dates) == 0:
         return "Sector & Industry Analysis", "No data loaded.", "Select Group", {}, {}, {'display': 'none'}, [], "Error", "Data could not be loaded.", [], go.Figure(layout={'template': template}), go.Figure(layout={'template': template})
 
     try:
-        mask = (group_analytics_df['analysis_date'] >= pd.to_datetime(start_date)) & (group_analytics_df['analysis_date'] <= pd.to_datetime(end_date))
-        filtered_df = group_analytics_df.loc[mask]
-        if filtered_df.empty: raise ValueError("No data in selected date range")
+        range_start, range_end = pd.to_datetime(start_date), pd.to_datetime(end_date)
+        if range_start is None or range_end is None: raise ValueError("Incomplete date range")
+        # Latest analysis date on or before the end of the range.
+        latest_pos = np.searchsorted(group_analysis_dates, range_end.to_datetime64(), side='right') - 1
+        if latest_pos < 0 or group_analysis_dates[latest_pos] < range_start: raise ValueError("No data in selected date range")
     except (TypeError, ValueError):
         return "Sector & Industry Analysis", "Please select a valid date range.", "Select Group", {}, {}, {'display': 'none'}, [], "Error", "Waiting for valid date range...", [], go.Figure(layout={'template': template}), go.Figure(layout={'template': template})
 
@@ -65,49 +84,40 @@ def update_meso_view(analysis_mode, selected_group, start_date, end_date, toggle
     if not selected_group:
         # --- OVERVIEW MODE ---
         style_heatmap, style_analysis, style_back_btn = {'display': 'block'}, {'display': 'none'}, {'display': 'none'}
-        latest_date = filtered_df['analysis_date'].max()
-        latest_df = filtered_df[(filtered_df['analysis_date'] == latest_date) & (filtered_df['group_type'] == analysis_mode)]
+        latest_df = get_group_snapshot(analysis_mode, pd.Timestamp(group_analysis_dates[latest_pos]))
         if latest_df.empty: return title, subtitle, select_label, style_heatmap, style_analysis, style_back_btn, [], f"{mode_cap} Overview", "No data for this time period.", [], go.Figure(layout={'template': template}), go.Figure(layout={'template': template})
 
         total = len(latest_df)
-        pct_200 = round(100*latest_df['above_rs_200sma'].sum()/total)
-        stats = dbc.Row([create_stat_card(f"Total {mode_cap}s", total), create_stat_card("% > 200 SMA", f"{pct_200}%", get_status_class(pct_200,70,30)), create_stat_card("% > 50 SMA", f"{round(100*latest_df['above_rs_50sma'].sum()/total)}%", get_status_class(round(100*latest_df['above_rs_50sma'].sum()/total),70,30)), create_stat_card("% > 20 SMA", f"{round(100*latest_df['above_rs_20sma'].sum()/total)}%", get_status_class(round(100*latest_df['above_rs_20sma'].sum()/total),70,30))])
+        count_200 = latest_df['above_rs_200sma'].sum()
+        pct_200 = round(100*count_200/total)
+        pct_50 = round(100*latest_df['above_rs_50sma'].sum()/total)
+        pct_20 = round(100*latest_df['above_rs_20sma'].sum()/total)
+        stats = dbc.Row([create_stat_card(f"Total {mode_cap}s", total), create_stat_card("% > 200 SMA", f"{pct_200}%", get_status_class(pct_200,70,30)), create_stat_card("% > 50 SMA", f"{pct_50}%", get_status_class(pct_50,70,30)), create_stat_card("% > 20 SMA", f"{pct_20}%", get_status_class(pct_20,70,30))])
         
         summary_title = f"{mode_cap} Overview Summary"
         sorted_df = latest_df.sort_values(by='group_rs_value', ascending=False)
         leader, laggard = sorted_df.iloc[0]['group_name'], sorted_df.iloc[-1]['group_name']
-        summary = f"Breadth: {latest_df['above_rs_200sma'].sum()}/{total} {analysis_mode}s ({pct_200}%) are in long-term uptrends.\n\nLeadership: {leader} is strongest, {laggard} is weakest."
+        summary = f"Breadth: {count_200}/{total} {analysis_mode}s ({pct_200}%) are in long-term uptrends.\n\nLeadership: {leader} is strongest, {laggard} is weakest."
         
-        heatmap_data = latest_df.sort_values(by=['above_rs_200sma','above_rs_50sma','group_rs_roc_20','group_rs_value'], ascending=[False,False,False,False])
+        heatmap_data = latest_df  # snapshots come pre-sorted in ranking order
         
         # --- START: MODIFIED TABLE CREATION LOGIC ---
+        # Industry rows carry an extra Sector column; it is resolved for the whole column at once.
+        group_names = heatmap_data['group_name'].to_numpy()
+        industry_to_sector_map = get_industry_to_sector_map()
+        sectors = [industry_to_sector_map.get(name, 'N/A') for name in group_names] if analysis_mode == 'industry' else None
+        header_labels = [mode_cap] + (["Sector"] if sectors is not None else []) + ["RS Val", "20D Mom", "vs 50D", "vs 200D"]
+        table_header = [html.Thead(html.Tr([html.Th(label) for label in header_labels]))]
         table_rows = []
-        if analysis_mode == 'industry':
-            table_header = [html.Thead(html.Tr([html.Th("Industry"), html.Th("Sector"), html.Th("RS Val"), html.Th("20D Mom"), html.Th("vs 50D"), html.Th("vs 200D")]))]
-            for i, row in heatmap_data.iterrows():
-                roc_val = f"{row['group_rs_roc_20']:.1f}%" if pd.notna(row['group_rs_roc_20']) else "N/A"
-                sector = industry_to_sector_map.get(row['group_name'], 'N/A')
-                cells = [
-                    html.Td(row['group_name']),
-                    html.Td(sector),
-                    html.Td(f"{row['group_rs_value']:.3f}"),
-                    html.Td(roc_val, className=get_status_class(row.get('group_rs_roc_20', 0), 5, -5)),
-                    html.Td("Above" if row['above_rs_50sma'] else "Below", className="text-success" if row['above_rs_50sma'] else "text-danger"),
-                    html.Td("Above" if row['above_rs_200sma'] else "Below", className="text-success" if row['above_rs_200sma'] else "text-danger"),
-                ]
-                table_rows.append(html.Tr(cells, id={'type':'heatmap-row','index':row['group_name']}, className='clickable-row', n_clicks=0))
-        else: # Sector mode
-            table_header = [html.Thead(html.Tr([html.Th("Sector"), html.Th("RS Val"), html.Th("20D Mom"), html.Th("vs 50D"), html.Th("vs 200D")]))]
-            for i, row in heatmap_data.iterrows():
-                roc_val = f"{row['group_rs_roc_20']:.1f}%" if pd.notna(row['group_rs_roc_20']) else "N/A"
-                cells = [
-                    html.Td(row['group_name']),
-                    html.Td(f"{row['group_rs_value']:.3f}"),
-                    html.Td(roc_val, className=get_status_class(row.get('group_rs_roc_20', 0), 5, -5)),
-                    html.Td("Above" if row['above_rs_50sma'] else "Below", className="text-success" if row['above_rs_50sma'] else "text-danger"),
-                    html.Td("Above" if row['above_rs_200sma'] else "Below", className="text-success" if row['above_rs_200sma'] else "text-danger"),
-                ]
-                table_rows.append(html.Tr(cells, id={'type':'heatmap-row','index':row['group_name']}, className='clickable-row', n_clicks=0))
+        for i, (group_name, rs_value, roc_20, above_50, above_200) in enumerate(zip(group_names, *(heatmap_data[c].to_numpy() for c in ['group_rs_value', 'group_rs_roc_20', 'above_rs_50sma', 'above_rs_200sma']))):
+            roc_val = f"{roc_20:.1f}%" if pd.notna(roc_20) else "N/A"
+            cells = [html.Td(group_name)] + ([html.Td(sectors[i])] if sectors is not None else []) + [
+                html.Td(f"{rs_value:.3f}"),
+                html.Td(roc_val, className=get_status_class(roc_20, 5, -5)),
+                html.Td("Above" if above_50 else "Below", className="text-success" if above_50 else "text-danger"),
+                html.Td("Above" if above_200 else "Below", className="text-success" if above_200 else "text-danger"),
+            ]
+            table_rows.append(html.Tr(cells, id={'type':'heatmap-row','index':group_name}, className='clickable-row', n_clicks=0))
 
         table = dbc.Table(table_header + [html.Tbody(table_rows)], bordered=False, hover=True, striped=True, responsive=True, className="small")
         heatmap = [html.H4(f"{mode_cap} Performance Ranking", className="card-title"), html.Hr(), table]
@@ -117,7 +127,7 @@ def update_meso_view(analysis_mode, selected_group, start_date, end_date, toggle
     else:
         # --- GROUP DETAIL MODE ---
         style_heatmap, style_analysis, style_back_btn = {'display': 'none'}, {'display': 'block'}, {'display': 'block'}
-        group_df = filtered_df[(filtered_df['group_type'] == analysis_mode) & (filtered_df['group_name'] == selected_group)].sort_values('analysis_date')
+        group_df = get_group_history(analysis_mode, selected_group, range_start.to_datetime64(), range_end.to_datetime64())
         if group_df.empty: return title, subtitle, select_label, style_heatmap, style_analysis, style_back_btn, html.Div("No data for this group."), "Summary", "", [], go.Figure(layout={'template': template}), go.Figure(layout={'template': template})
         
         latest = group_df.iloc[-1]
@@ -125,11 +135,21 @@ def update_meso_view(analysis_mode, selected_group, start_date, end_date, toggle
         summary_title, trend = f"Analysis: {selected_group}", ("uptrend" if latest['above_rs_200sma'] else "downtrend")
         summary = f"The {selected_group} {analysis_mode} is in a long-term {trend}, with its RS value { 'above' if latest['above_rs_200sma'] else 'below'} its 200-day MA."
         
-        rs_fig = go.Figure(layout={'template':template,'height':350}).add_traces([go.Scatter(x=group_df['analysis_date'], y=group_df[c], name=n, line=dict(color=co, dash=d)) for c,n,co,d in [('group_rs_value','Group RS','#1f77b4','solid'),('group_rs_sma_200','200D SMA','#d62728','dot'),('group_rs_sma_50','50D SMA','#2ca02c','dot')]]).update_layout(title="<b>RS Trend</b>", margin=dict(t=30,b=10), legend=dict(orientation="h",yanchor="bottom",y=1.02,xanchor="right",x=1))
-        momentum_fig = go.Figure(layout={'template':template,'height':350}).add_trace(go.Bar(x=group_df['analysis_date'],y=group_df['group_rs_roc_20'],name='20D ROC',marker_color=["#2ca02c" if x>=0 else "#d62728" for x in group_df['group_rs_roc_20']])).update_layout(title="<b>RS Momentum (ROC)</b>", margin=dict(t=30,b=10), yaxis_ticksuffix='%')
+        rs_fig, momentum_fig = build_group_figures(analysis_mode, selected_group, range_start, range_end, template)
 
         return title, subtitle, select_label, style_heatmap, style_analysis, style_back_btn, stats, summary_title, summary, [], rs_fig, momentum_fig
 
+# Theme changes only swap the chart templates instead of rebuilding the whole meso view.
+@callback(
+    Output('rs-chart', 'figure', allow_duplicate=True), Output('momentum-chart', 'figure', allow_duplicate=True),
+    Input(ThemeSwitchAIO.ids.switch("theme"), "value"),
+    prevent_initial_call=True
+)
+def restyle_meso_charts(toggle_on):
+    patched_fig = Patch()
+    patched_fig['layout']['template'] = pio.templates["plotly_dark" if toggle_on else "plotly_white"]
+    return patched_fig, patched_fig
+
 @callback(
     Output('group-select-dropdown', 'value'),
     Input({'type': 'heatmap-row', 'index': ALL}, 'n_clicks'),
@@ -163,6 +183,7 @@ def go_back_to_overview(n_clicks):
 )
 def update_meso_date_range_from_buttons(*args):
     button_id = ctx.triggered_id if ctx.triggered_id else 'meso-btn-1y'
+    group_analytics_df = get_group_analytics().df
     if group_analytics_df.empty: raise PreventUpdate
     end_date = group_analytics_df['analysis_date'].max()
     deltas = {'3m':3,'6m':6,'1y':12,'2y':24,'5y':60}
@@ -174,14 +195,11 @@ def update_meso_date_range_from_buttons(*args):
     Input('meso-main-title', 'children') 
 )
 def update_rs_leaders_table(main_title):
-    if latest_stock_analytics_df.empty:
+    if get_latest_stock_analytics().empty:
         return html.P("Stock analytics data not loaded.", className="text-danger")
 
-    # --- FIX: Exclude the benchmark ticker from the list ---
-    leaders_df = latest_stock_analytics_df[
-        (latest_stock_analytics_df['trend'] == 'Uptrend') &
-        (latest_stock_analytics_df['ticker'] != '^GSPC') # <-- ADD THIS CONDITION
-    ].sort_values(by='rs', ascending=False).head(25)
+    # Uptrend stocks by RS, benchmark excluded; selected once in Dashboard.data.
+    leaders_df = get_rs_leaders_top25()
 
     if leaders_df.empty:
         return html.P("No stocks currently meet the criteria for leadership (Uptrend with high RS).", className="text-warning")
@@ -198,13 +216,14 @@ def update_rs_leaders_table(main_title):
     ]
 
     table_rows = []
-    for i, row in leaders_df.iterrows():
+    leader_rows = zip(*(leaders_df[c].to_numpy() for c in ['ticker', 'sector', 'industry', 'rs', 'perf_ytd']))
+    for ticker, sector, industry, rs, perf_ytd in leader_rows:
         table_rows.append(html.Tr([
-            html.Td(row['ticker']),
-            html.Td(row['sector']),
-            html.Td(row['industry']),
-            html.Td(f"{row['rs']:.3f}"),
-            html.Td(f"{row['perf_ytd']:.2f}%", className="text-success" if row['perf_ytd'] > 0 else "text-danger")
+            html.Td(ticker),
+            html.Td(sector),
+            html.Td(industry),
+            html.Td(f"{rs:.3f}"),
+            html.Td(f"{perf_ytd:.2f}%", className="text-success" if perf_ytd > 0 else "text-danger")
         ]))
     
     table_body = [html.Tbody(table_rows)]
@@ -1,14 +1,24 @@
 import pandas as pd
-from sqlalchemy import create_engine
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
 import json
 import logging
 import os
+import io
+import glob
+import hashlib
+import threading
+from collections import namedtuple
+from functools import lru_cache, wraps
+from concurrent.futures import ThreadPoolExecutor
 
 # --- SETUP ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+@lru_cache(maxsize=1)
 def load_config(config_path='Data Collection/config.json'):
-    """Loads the database configuration from the project root."""
+    """Loads the database configuration from the project root (parsed once per process)."""
     logging.info("Loading configuration...")
     try:
         with open(config_path, 'r') as f:
@@ -22,43 +32,138 @@ def load_config(config_path='Data Collection/config.json'):
         logging.critical(f"❌ FATAL ERROR loading config: {e}")
         return None
 
+# One engine (and so one connection pool) per database URL, however often connect_to_db is called.
+_engines = {}
+
 def connect_to_db(config):
     try:
         db_config = config['database']
         engine_url = f"postgresql+psycopg2://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['dbname']}"
-        engine = create_engine(engine_url)
+        if engine_url in _engines:
+            return _engines[engine_url]
+        # Callbacks share this one engine, so keep a pool of warm connections instead of paying
+        # connect + auth on every query; pre-ping and recycle drop connections the server closed.
+        engine = _engines[engine_url] = create_engine(engine_url, poolclass=QueuePool, pool_size=10, max_overflow=20, pool_pre_ping=True, pool_recycle=1800)
         logging.info("✅ Database connection successful.")
         return engine
     except Exception as e:
         logging.critical(f"❌ Database connection failed: {e}")
         return None
 
+def read_sql_copy(query, params=None, **read_csv_kwargs):
+    """Runs a SELECT through COPY TO STDOUT and parses the CSV stream into a DataFrame."""
+    # COPY hands back the whole result as one text buffer, skipping the per-row tuple
+    # fetch and object boxing of read_sql. Bind parameters are rendered by psycopg2.
+    compiled = query.compile(dialect=engine.dialect)
+    buffer = io.StringIO()
+    raw_conn = engine.raw_connection()
+    try:
+        with raw_conn.cursor() as cur:
+            select_sql = cur.mogrify(str(compiled), compiled.construct_params(params)).decode()
+            cur.copy_expert(f"COPY ({select_sql.strip().rstrip(';')}) TO STDOUT WITH CSV HEADER", buffer)
+    finally:
+        raw_conn.close()
+    buffer.seek(0)
+    return pd.read_csv(buffer, **read_csv_kwargs)
+
+def read_sql_streamed(query, conn, chunksize=100_000, **read_sql_kwargs):
+    """Reads a query in chunks through a server-side cursor and stitches them back together."""
+    # With stream_results the driver fetches rows from a named cursor chunk by chunk instead of
+    # buffering the whole result client-side before pandas builds its own copy.
+    chunks = pd.read_sql_query(query, con=conn, chunksize=chunksize, **read_sql_kwargs)
+    # Chunks that happen to be all-NULL in a column come back as object; infer_objects restores
+    # the numeric dtype a single read would have produced.
+    return pd.concat(chunks, ignore_index='index_col' not in read_sql_kwargs).infer_objects()
+
+def cached_load(cache_key, data_version, loader):
+    """Returns loader() through an on-disk pickle cache keyed by cache_key and the data version."""
+    # Every dashboard process used to re-run the same scans and post-processing on boot. A result
+    # saved for one data version (see DATA_VERSION_QUERY) is reused by any later process until an
+    # ETL run writes to the tables again.
+    if data_version is None:
+        return loader()
+    cache_path = os.path.join(dashboard_cache_directory, f"{cache_key}_{data_version}.pkl")
+    if os.path.exists(cache_path):
+        try:
+            return pd.read_pickle(cache_path)
+        except Exception as e:
+            logging.warning(f"⚠️ Ignoring unreadable dashboard cache {cache_path}: {e}")
+    result = loader()
+    try:
+        os.makedirs(dashboard_cache_directory, exist_ok=True)
+        for stale_path in glob.glob(os.path.join(dashboard_cache_directory, f"{cache_key}_*.pkl")):
+            os.remove(stale_path)
+        # Written under a temporary name and renamed, so a concurrent reader never sees half a file.
+        pd.to_pickle(result, f"{cache_path}.tmp", protocol=5)
+        os.replace(f"{cache_path}.tmp", cache_path)
+    except OSError as e:
+        logging.warning(f"⚠️ Could not write dashboard cache {cache_path}: {e}")
+    return result
+
+def cached_read_sql(query, conn, data_version, **read_sql_kwargs):
+    """read_sql_streamed behind the on-disk cache, keyed by the query text and its arguments."""
+    query_key = hashlib.sha1(f"{query}|{sorted(read_sql_kwargs.items())}".encode()).hexdigest()
+    return cached_load(query_key, data_version, lambda: read_sql_streamed(query, conn, **read_sql_kwargs))
+
+# --- SQL Queries ---
+# Built once as text() constructs, so SQLAlchemy's compiled-statement cache is hit on every
+# reuse instead of re-parsing a raw string per call.
+MAX_DATE_QUERY = text("SELECT MAX(date) FROM daily_stock_analytics")
+# Cumulative row-change counters of the tables the dashboard caches read from. Any ETL write
+# moves them, including re-runs and backfills that leave the latest analytics date unchanged.
+DATA_VERSION_QUERY = text("""
+SELECT string_agg(relname || ':' || (n_tup_ins + n_tup_upd + n_tup_del), ',' ORDER BY relname)
+FROM pg_stat_user_tables
+WHERE relname IN ('stocks', 'daily_stock_analytics', 'daily_group_analytics', 'daily_market_indicators')
+""")
+
+GAUGE_QUERY = text("""
+SELECT
+    COUNT(*) AS total,
+    100.0 * SUM(CASE WHEN d.adj_close > a.ma_20 THEN 1 ELSE 0 END) / NULLIF(COUNT(*), 0) AS ma_20,
+    100.0 * SUM(CASE WHEN d.adj_close > a.ma_50 THEN 1 ELSE 0 END) / NULLIF(COUNT(*), 0) AS ma_50,
+    100.0 * SUM(CASE WHEN d.adj_close > a.ma_200 THEN 1 ELSE 0 END) / NULLIF(COUNT(*), 0) AS ma_200
+FROM daily_stock_data d JOIN daily_stock_analytics a ON d.ticker = a.ticker AND d.date = a.date
+WHERE d.date = :latest_date;
+""")
+
+# The full indicators history is the largest read, so it goes through COPY rather than a cursor fetch.
+MARKET_INDICATORS_QUERY = text("SELECT * FROM daily_market_indicators ORDER BY date")
+SPX_QUERY = text("SELECT date, hlcc4 FROM daily_stock_analytics WHERE ticker = '^GSPC' ORDER BY date")
+STOCK_METADATA_QUERY = text("SELECT ticker, sector, industry FROM stocks")
+
 # --- Main Data Loading Section ---
 logging.info("--- Initializing Data Module ---")
 config = load_config()
 engine = connect_to_db(config)
+streaming_engine = engine.execution_options(stream_results=True) if engine else None
+dashboard_cache_directory = os.path.join((config or {}).get('output_settings', {}).get('cache_directory', 'cache'), 'dashboard')
 
 # --- REFACTORED: Removed breadth_df and trend_pct_df from global scope ---
-market_indicators_df, spx_df, heatmap_df, group_analytics_df, latest_stock_analytics_df, breakout_stocks_df, stock_metadata_df = (pd.DataFrame() for _ in range(7))
-industry_to_sector_map = {}
+# Only the macro tab's data is loaded at import; the meso tab's datasets load on first use below.
+market_indicators_df, spx_df, stock_metadata_df = (pd.DataFrame() for _ in range(3))
 latest_date = pd.Timestamp.now()
+data_version = None  # latest analytics date plus the table change counters; keys the on-disk query cache
 total_stocks_latest = 0
-latest_df = pd.DataFrame()
+gauge_percentages = {'ma_20': 0, 'ma_50': 0, 'ma_200': 0}
 
 if engine:
     try:
         # --- PART A: Load LATEST data for the gauges (This is a small, efficient query) ---
-        latest_data_query = """
-        WITH latest_date AS (SELECT MAX(date) as max_date FROM daily_stock_analytics)
-        SELECT d.ticker, d.adj_close, a.ma_20, a.ma_50, a.ma_200
-        FROM daily_stock_data d JOIN daily_stock_analytics a ON d.ticker = a.ticker AND d.date = a.date
-        WHERE d.date = (SELECT max_date FROM latest_date);
-        """
-        latest_df = pd.read_sql_query(latest_data_query, con=engine)
-        total_stocks_latest = len(latest_df)
-        latest_date_df = pd.read_sql_query("SELECT MAX(date) as max_date FROM daily_stock_analytics", con=engine)
-        if not latest_date_df.empty and pd.notna(latest_date_df['max_date'][0]):
-            latest_date = latest_date_df['max_date'][0]
+        # The latest date is looked up once and bound into the gauge query as a constant; both
+        # queries run on the same checked-out connection.
+        with engine.connect() as connection:
+            max_date = connection.scalar(MAX_DATE_QUERY)
+            if max_date is not None:
+                latest_date = max_date
+                table_counters = connection.scalar(DATA_VERSION_QUERY)
+                data_version = hashlib.sha1(f"{latest_date}|{table_counters}".encode()).hexdigest()[:16]
+                # The gauges only need three percentages, so they are aggregated in Postgres rather than
+                # shipping every stock's latest row. A NULL moving average counts as "not above".
+                gauge_row = connection.execute(GAUGE_QUERY, {'latest_date': latest_date}).mappings().one()
+                total_stocks_latest = int(gauge_row['total'])
+                if total_stocks_latest > 0:
+                    gauge_percentages = {ma: float(gauge_row[ma]) for ma in gauge_percentages}
 
         # --- REMOVED: Parts B and C ---
         # The logic to load the entire historical dataset into memory has been removed.
@@ -66,58 +171,134 @@ if engine:
         # These calculations are now performed efficiently inside the relevant callback
         # using direct, targeted SQL queries.
         
+        # The macro tab's reads are independent, so they run concurrently, each on its own pooled
+        # connection streaming from a server-side cursor; psycopg2 releases the GIL while waiting
+        # on Postgres. The results are post-processed part by part below.
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            pending = {
+                'market_indicators': executor.submit(cached_load, 'market_indicators', data_version, lambda: read_sql_copy(MARKET_INDICATORS_QUERY, index_col='date', parse_dates=['date'])),
+                'spx': executor.submit(cached_read_sql, SPX_QUERY, streaming_engine, data_version, index_col='date', parse_dates=['date']),
+                'stock_metadata': executor.submit(cached_read_sql, STOCK_METADATA_QUERY, streaming_engine, data_version),
+            }
+            loaded = {name: future.result() for name, future in pending.items()}
+
         # --- PART D: Load Consolidated Market Indicators and S&P 500 Data ---
-        market_indicators_df = pd.read_sql_query("SELECT * FROM daily_market_indicators ORDER BY date", con=engine, index_col='date', parse_dates=['date'])
-        spx_query = "SELECT date, hlcc4 FROM daily_stock_analytics WHERE ticker = '^GSPC' ORDER BY date"
-        spx_df = pd.read_sql_query(spx_query, con=engine, index_col='date', parse_dates=['date'])
+        market_indicators_df, spx_df = loaded['market_indicators'], loaded['spx']
         logging.info(f"✅ Loaded {len(market_indicators_df)} rows of consolidated market indicators.")
 
-        # --- PART E: Load Data for Sector Heatmap ---
-        heatmap_query = """
-        WITH latest_analytics AS (
-            SELECT
-                ticker,
-                ROW_NUMBER() OVER(PARTITION BY ticker ORDER BY date DESC) as rn,
-                perf_1w, perf_1m, perf_3m, perf_6m, perf_ytd
-            FROM daily_stock_analytics
-        )
-        SELECT s.sector, s.industry, s.market_cap, la.perf_1w, la.perf_1m, la.perf_3m, la.perf_6m, la.perf_ytd
-        FROM stocks s JOIN latest_analytics la ON s.ticker = la.ticker
-        WHERE la.rn = 1 AND s.sector != 'Unknown' AND s.sector IS NOT NULL;
-        """
-        heatmap_df = pd.read_sql_query(heatmap_query, con=engine)
-        logging.info(f"✅ Loaded heatmap data for {len(heatmap_df)} stocks.")
-
-        if not heatmap_df.empty:
-            industry_sector_pairs = heatmap_df[['industry', 'sector']].drop_duplicates()
-            industry_to_sector_map = pd.Series(industry_sector_pairs.sector.values, index=industry_sector_pairs.industry).to_dict()
-            logging.info(f"✅ Created map for {len(industry_to_sector_map)} industries to sectors.")
-
-        # --- PART F: Load Data for Group Analysis ---
-        group_analytics_df = pd.read_sql_query("SELECT * FROM daily_group_analytics", con=engine)
-        group_analytics_df['analysis_date'] = pd.to_datetime(group_analytics_df['analysis_date'])
-        logging.info(f"✅ Loaded {len(group_analytics_df)} rows of group analytics data.")
-        
-        # --- PART G: Load LATEST data for ALL individual stocks for drill-down ---
-        stock_list_query = """
-        WITH latest_data AS (
-            SELECT *, ROW_NUMBER() OVER(PARTITION BY ticker ORDER BY date DESC) as rn
-            FROM daily_stock_analytics
-        )
-        SELECT s.ticker, s.sector, s.industry, ld.rs, ld.trend, ld.perf_1m, ld.perf_ytd
-        FROM stocks s JOIN latest_data ld ON s.ticker = ld.ticker WHERE ld.rn = 1;
-        """
-        latest_stock_analytics_df = pd.read_sql_query(stock_list_query, con=engine)
-        logging.info(f"✅ Loaded latest analytics for {len(latest_stock_analytics_df)} individual stocks.")
-        
-        # --- PART H: Load Data for Breakout Modal ---
-        breakout_stocks_df = pd.read_sql_query("SELECT * FROM daily_breakout_stocks", con=engine, parse_dates=['date'])
-        logging.info(f"✅ Loaded {len(breakout_stocks_df)} breakout stock instances.")
-        
         # --- PART I: Load Stock Metadata for Modal Formatting ---
-        stock_metadata_df = pd.read_sql_query("SELECT ticker, sector, industry FROM stocks", con=engine)
+        stock_metadata_df = loaded['stock_metadata'].astype({'ticker': 'category', 'sector': 'category', 'industry': 'category'})
         logging.info(f"✅ Loaded stock metadata for {len(stock_metadata_df)} tickers.")
         
         logging.info("✅ Data module initialized successfully.")
     except Exception as e:
-        logging.error(f"❌ A major error occurred during data loading: {e}", exc_info=True)
\ No newline at end of file
+        logging.error(f"❌ A major error occurred during data loading: {e}", exc_info=True)
+
+# --- Meso Tab Data (loaded on first use) ---
+# Parts E-G only feed the Sector & Industry tab, so they are loaded the first time one of its
+# callbacks asks for them instead of delaying the macro tab at import. Each loader runs once per
+# process; the lock stops the tab's callbacks, which fire together, from loading it twice.
+_lazy_load_lock = threading.RLock()
+
+def load_once(loader):
+    """Memoizes a zero-argument loader behind the shared lazy-load lock."""
+    cached_loader = lru_cache(maxsize=1)(loader)
+    @wraps(loader)
+    def wrapper():
+        with _lazy_load_lock:
+            return cached_loader()
+    return wrapper
+
+INDUSTRY_SECTOR_QUERY = text("SELECT DISTINCT industry, sector FROM stocks WHERE sector IS NOT NULL AND sector != 'Unknown'")
+
+@load_once
+def get_industry_to_sector_map():
+    # Deduplicated in Postgres, so only one row per industry comes back rather than one per ticker.
+    if not engine: return {}
+    try:
+        with engine.connect() as connection:
+            industry_to_sector_map = dict(connection.execute(INDUSTRY_SECTOR_QUERY).all())
+        logging.info(f"✅ Created map for {len(industry_to_sector_map)} industries to sectors.")
+        return industry_to_sector_map
+    except Exception as e:
+        logging.error(f"❌ Failed to load the industry to sector map: {e}", exc_info=True)
+        return {}
+
+# --- PART F: Data for Group Analysis ---
+GroupAnalytics = namedtuple('GroupAnalytics', ['df', 'dates', 'date_values', 'block_bounds', 'date_positions'])
+HEATMAP_SORT_COLUMNS = ['above_rs_200sma', 'above_rs_50sma', 'group_rs_roc_20', 'group_rs_value']
+GROUP_ANALYTICS_QUERY = text("SELECT * FROM daily_group_analytics")
+
+def build_group_analytics():
+    """daily_group_analytics plus the lookup structures the meso callbacks search it with."""
+    group_analytics_df = read_sql_streamed(GROUP_ANALYTICS_QUERY, streaming_engine)
+    group_analytics_df['analysis_date'] = pd.to_datetime(group_analytics_df['analysis_date'])
+    # Labels are stored as categoricals: equality masks compare integer codes and each distinct
+    # name is held once instead of as one Python string per row.
+    group_analytics_df = group_analytics_df.astype({'group_type': 'category', 'group_name': 'category'})
+    # Rows are kept grouped by (group_type, group_name) in date order, so a group's history
+    # over any date range is one contiguous slice located by binary search.
+    group_analytics_df = group_analytics_df.sort_values(['group_type', 'group_name', 'analysis_date'], ignore_index=True)
+    block_bounds = {key: (positions[0], positions[-1] + 1) for key, positions in group_analytics_df.groupby(['group_type', 'group_name'], sort=False, observed=True).indices.items()}
+    # Row positions per analysis date, so a single day's snapshot is a dict lookup rather than a scan.
+    date_positions = group_analytics_df.groupby('analysis_date').indices
+    # The meso overview only ever shows the latest analysis date in the picked range, so the
+    # sorted distinct dates are kept for a binary search.
+    dates = np.sort(group_analytics_df['analysis_date'].unique())
+    return GroupAnalytics(group_analytics_df, dates, group_analytics_df['analysis_date'].to_numpy(), block_bounds, date_positions)
+
+@load_once
+def get_group_analytics():
+    empty_dates = np.array([], dtype='datetime64[ns]')
+    if not engine: return GroupAnalytics(pd.DataFrame(), empty_dates, empty_dates, {}, {})
+    try:
+        # Cached after post-processing, so a warm boot also skips the sort and index building.
+        group_data = cached_load('group_analytics', data_version, build_group_analytics)
+        logging.info(f"✅ Loaded {len(group_data.df)} rows of group analytics data.")
+        return group_data
+    except Exception as e:
+        logging.error(f"❌ Failed to load group analytics data: {e}", exc_info=True)
+        return GroupAnalytics(pd.DataFrame(), empty_dates, empty_dates, {}, {})
+
+@lru_cache(maxsize=64)
+def get_group_snapshot(group_type, analysis_date):
+    """Rows for one group type on one analysis date, already in heatmap ranking order."""
+    group_data = get_group_analytics()
+    date_rows = group_data.df.iloc[group_data.date_positions.get(analysis_date, [])]
+    snapshot = date_rows[date_rows['group_type'] == group_type]
+    return snapshot.sort_values(by=HEATMAP_SORT_COLUMNS, ascending=False).reset_index(drop=True)
+
+def get_group_history(group_type, group_name, start, end):
+    """One group's rows between start and end (inclusive), already in date order."""
+    group_data = get_group_analytics()
+    lo, hi = group_data.block_bounds.get((group_type, group_name), (0, 0))
+    block_dates = group_data.date_values[lo:hi]
+    return group_data.df.iloc[lo + np.searchsorted(block_dates, start):lo + np.searchsorted(block_dates, end, side='right')]
+
+# --- PART G: LATEST data for ALL individual stocks for drill-down ---
+# Reads the latest row per ticker from mv_latest_stock_analytics, which the analytics
+# pipeline refreshes after every run.
+STOCK_LIST_QUERY = text("""
+SELECT s.ticker, s.sector, s.industry, ld.rs, ld.trend, ld.perf_1m, ld.perf_ytd
+FROM stocks s JOIN mv_latest_stock_analytics ld ON s.ticker = ld.ticker;
+""")
+
+@load_once
+def get_latest_stock_analytics():
+    if not engine: return pd.DataFrame()
+    try:
+        latest_stock_analytics_df = cached_read_sql(STOCK_LIST_QUERY, streaming_engine, data_version)
+        for col in ('ticker', 'trend', 'sector', 'industry'):
+            latest_stock_analytics_df[col] = latest_stock_analytics_df[col].astype('category')
+        logging.info(f"✅ Loaded latest analytics for {len(latest_stock_analytics_df)} individual stocks.")
+        return latest_stock_analytics_df
+    except Exception as e:
+        logging.error(f"❌ Failed to load latest stock analytics: {e}", exc_info=True)
+        return pd.DataFrame()
+
+@load_once
+def get_rs_leaders_top25():
+    """Uptrend stocks with the highest RS (benchmark excluded), picked once from the latest snapshot."""
+    latest_stock_analytics_df = get_latest_stock_analytics()
+    if latest_stock_analytics_df.empty: return pd.DataFrame()
+    return latest_stock_analytics_df[(latest_stock_analytics_df['trend'] == 'Uptrend') & (latest_stock_analytics_df['ticker'] != '^GSPC')].nlargest(25, 'rs').reset_index(drop=True)
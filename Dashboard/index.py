@@ -1,4 +1,4 @@
-from dash import dcc, html, Input, Output, callback
+from dash import dcc, html, Input, Output, State, callback, no_update
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import ThemeSwitchAIO
 from Dashboard.app import app, url_theme_light, url_theme_dark
@@ -26,18 +26,36 @@ app.layout = dbc.Container(
             active_tab="macro",
             persistence=True,
         ),
-        html.Div(id="tab-content", className="mt-4"),
+        # Tabs stay mounted once shown; switching tabs only toggles which one is displayed.
+        # The meso layout is mounted on its first activation, so its data isn't loaded until needed.
+        html.Div(
+            [
+                html.Div(macro.layout, id="macro-tab-content"),
+                html.Div(id="meso-tab-content", style={"display": "none"}),
+                dcc.Store(id="meso-tab-mounted", data=False),
+            ],
+            id="tab-content",
+            className="mt-4",
+        ),
     ],
     fluid=True,
     className="dbc"
 )
 
 # --- Callbacks for the Master Layout ---
-@callback(Output("tab-content", "children"), Input("tabs", "active_tab"))
-def render_tab_content(active_tab):
+@callback(
+    Output("macro-tab-content", "style"),
+    Output("meso-tab-content", "style"),
+    Output("meso-tab-content", "children"),
+    Output("meso-tab-mounted", "data"),
+    Input("tabs", "active_tab"),
+    State("meso-tab-mounted", "data"),
+)
+def render_tab_content(active_tab, meso_mounted):
+    hidden = {"display": "none"}
     if active_tab == "meso":
-        return meso.layout
-    return macro.layout
+        return hidden, None, (no_update if meso_mounted else meso.layout), True
+    return None, hidden, no_update, no_update
 
 # --- Run the Application ---
 if __name__ == "__main__":
@@ -45,6 +45,28 @@ def load_config(logger, default_config_path='config.json'):
         logger.critical(f"❌ FATAL ERROR loading config: {e}")
         return None
 
+def psql_insert_copy(table, conn, keys, data_iter):
+    """to_sql insertion method that streams the rows through Postgres COPY FROM STDIN."""
+    # COPY skips per-row INSERT parsing and planning; pandas has already turned NaN into None,
+    # which the CSV writer emits as an unquoted empty field, i.e. NULL.
+    dbapi_conn = conn.connection
+    with dbapi_conn.cursor() as cur:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(data_iter)
+        buffer.seek(0)
+        columns = ', '.join(f'"{k}"' for k in keys)
+        table_name = f"{table.schema}.{table.name}" if table.schema else table.name
+        cur.copy_expert(f"COPY {table_name} ({columns}) FROM STDIN WITH CSV", buffer)
+
+def read_sql_streamed(query, engine, chunksize=500_000, **read_sql_kwargs):
+    """Reads a query in chunks through a server-side cursor and stitches them back together."""
+    # stream_results makes psycopg2 fetch from a named cursor chunk by chunk, so the full result
+    # is never buffered as Python tuples on top of the DataFrame pandas builds from it.
+    chunks = pd.read_sql(query, con=engine.execution_options(stream_results=True), chunksize=chunksize, **read_sql_kwargs)
+    # A chunk whose column is entirely NULL comes back as object; infer_objects restores the
+    # dtype a single read would have produced.
+    return pd.concat(chunks, ignore_index=True).infer_objects()
+
 def get_calculation_date_range(engine, logger):
     """Finds the date from which analytics need to be (re)calculated."""
     with engine.connect() as connection:
@@ -68,35 +90,43 @@ def get_calculation_date_range(engine, logger):
                 logger.error("CRITICAL: No raw data found in daily_stock_data table. Cannot proceed.")
                 return None
 
+# Split-adjusted HLCC4, computed by Postgres while it reads the raw rows so only the one derived
+# column crosses the wire instead of high and low. The adjustment factor is adj_close / close,
+# falling back to 1 when close is zero or missing. Everything is float8 and evaluated in the same
+# order as the pandas expression it replaced, so the values are unchanged.
+HLCC4_SQL = """
+    (high::float8 * COALESCE(adj_close::float8 / NULLIF(close::float8, 0), 1.0)
+     + low::float8 * COALESCE(adj_close::float8 / NULLIF(close::float8, 0), 1.0)
+     + adj_close::float8 + adj_close::float8) / 4 AS hlcc4"""
+
+# NUMERIC columns are cast to float8 in the SELECT: psycopg2 then hands back Python floats
+# directly instead of building a Decimal per value for pandas to convert afterwards.
+RAW_PRICE_COLUMNS_SQL = "close::float8 AS close, adj_close::float8 AS adj_close, volume"
+
 def calculate_indicators(df: pd.DataFrame, logger: logging.Logger, calc_start_date=None) -> pd.DataFrame:
     """Calculates all stock-specific analytical indicators."""
     logger.info("--- Starting Stock-Specific Indicator Calculations ---")
-    df['date'] = pd.to_datetime(df['date'])
     
-    logger.info("Step 1/6: Calculating HLCC4...")
-    df['close_safe'] = df['close'].replace(0, np.nan)
-    df['adjustment_factor'] = df['adj_close'] / df['close_safe']
-    df['adjustment_factor'] = df['adjustment_factor'].fillna(1.0)
-    df['adj_high'] = df['high'] * df['adjustment_factor']
-    df['adj_low'] = df['low'] * df['adjustment_factor']
-    df['hlcc4'] = (df['adj_high'] + df['adj_low'] + df['adj_close'] + df['adj_close']) / 4
-    df.drop(columns=['close_safe'], inplace=True)
+    # Step 1 (HLCC4) now happens in the raw data SELECT; see HLCC4_SQL.
     
     logger.info("Step 2/6: Calculating Moving Averages...")
-    # Group by ticker before applying rolling calculations
-    grouped = df.groupby('ticker')
-    df['ma_20'] = grouped['hlcc4'].transform(lambda x: x.rolling(window=20, min_periods=20).mean())
-    df['ma_50'] = grouped['hlcc4'].transform(lambda x: x.rolling(window=50, min_periods=50).mean())
-    df['ma_200'] = grouped['hlcc4'].transform(lambda x: x.rolling(window=200, min_periods=200).mean())
+    # Rows are put in (ticker, date) order once, so every per-ticker window below runs over
+    # consecutive trading days regardless of the order the database returned them in.
+    # The sort returns a new frame, which is the working copy; the caller's frame is left untouched.
+    df = df.sort_values(by=['ticker', 'date'], ignore_index=True)
+    df['date'] = pd.to_datetime(df['date'])
+    # Grouped rolling runs the Cython window kernel directly instead of a Python lambda per ticker.
+    grouped_hlcc4 = df.groupby('ticker', sort=False, observed=True)['hlcc4']
+    for window in (20, 50, 200):
+        df[f'ma_{window}'] = grouped_hlcc4.rolling(window=window, min_periods=window).mean().reset_index(level=0, drop=True)
     
     logger.info("Step 3/6: Calculating Relative Strength...")
-    spx_df = df[df['ticker'] == '^GSPC'][['date', 'hlcc4']].rename(columns={'hlcc4': 'spx_hlcc4'})
-    df = pd.merge(df, spx_df, on='date', how='left')
+    # The benchmark's HLCC4 is looked up per row by date rather than merged in as a column.
+    spx_hlcc4 = df.loc[df['ticker'] == '^GSPC'].set_index('date')['hlcc4']
     
     # --- THIS IS THE FIX ---
     # Replace infinite values that can result from division by zero with NaN
-    df['rs'] = df['hlcc4'] / df['spx_hlcc4']
-    df.replace([np.inf, -np.inf], np.nan, inplace=True)
+    df['rs'] = (df['hlcc4'] / df['date'].map(spx_hlcc4)).replace([np.inf, -np.inf], np.nan)
     
     # Now, drop any row where RS could not be calculated. This is the critical hardening step.
     # If RS is NaN, the entire row of analytics for that day is invalid.
@@ -113,21 +143,32 @@ def calculate_indicators(df: pd.DataFrame, logger: logging.Logger, calc_start_da
     df['trend'] = np.select([uptrend_conditions, downtrend_conditions], ['Uptrend', 'Downtrend'], default='Sideways')
     
     logger.info("Step 5/6: Calculating Performance Metrics...")
-    # Re-group after the merge and dropna
-    grouped_adj_close = df.groupby('ticker')['adj_close']
-    df['perf_1w'] = grouped_adj_close.pct_change(periods=5) * 100
-    df['perf_1m'] = grouped_adj_close.pct_change(periods=21) * 100
-    df['perf_3m'] = grouped_adj_close.pct_change(periods=63) * 100
-    df['perf_6m'] = grouped_adj_close.pct_change(periods=126) * 100
-    df['year'] = df['date'].dt.year
-    df['ytd_start_price'] = df.groupby(['ticker', 'year'])['adj_close'].transform('first')
-    df['perf_ytd'] = (df['adj_close'] / df['ytd_start_price'] - 1) * 100
+    # Rows are still in (ticker, date) order after the dropna, so each ticker's history is a
+    # contiguous run and a k-day change is a plain array shift, kept once the run is k rows long.
+    adj_close = df['adj_close'].to_numpy(dtype=np.float64)
+    tickers, years = df['ticker'].to_numpy(), df['date'].dt.year.to_numpy()
+    row_number = np.arange(len(df))
+    new_ticker = np.ones(len(df), dtype=bool)
+    new_ticker[1:] = tickers[1:] != tickers[:-1]
+    position_in_ticker = row_number - np.maximum.accumulate(np.where(new_ticker, row_number, 0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for column, periods in (('perf_1w', 5), ('perf_1m', 21), ('perf_3m', 63), ('perf_6m', 126)):
+            prior_close = np.full(len(df), np.nan)
+            prior_close[periods:] = adj_close[:-periods]
+            prior_close[position_in_ticker < periods] = np.nan
+            df[column] = (adj_close / prior_close - 1) * 100
+    # Likewise each ticker-year is a contiguous run; numbering the runs gives one integer key for
+    # the native 'first' reducer instead of a two-column groupby.
+    new_run = new_ticker.copy()
+    new_run[1:] |= years[1:] != years[:-1]
+    ticker_year_id = np.cumsum(new_run)
+    ytd_start_price = df['adj_close'].groupby(ticker_year_id, sort=False).transform('first')
+    df['perf_ytd'] = (df['adj_close'] / ytd_start_price - 1) * 100
     
     logger.info("Step 6/6: Preparing final data for storage...")
     final_cols = ['ticker', 'date', 'hlcc4', 'ma_20', 'ma_50', 'ma_200', 'rs', 'trend', 
                   'perf_1w', 'perf_1m', 'perf_3m', 'perf_6m', 'perf_ytd']
-    analytics_df = df[final_cols].copy()
-    analytics_df = analytics_df.dropna(subset=['ma_200'])
+    analytics_df = df[final_cols].dropna(subset=['ma_200'])
     
     if calc_start_date:
         analytics_df = analytics_df[analytics_df['date'] >= pd.to_datetime(calc_start_date)]
@@ -153,21 +194,21 @@ def calculate_group_analytics(daily_analytics_df: pd.DataFrame, stocks_df: pd.Da
         filtered_groups = merged_df[merged_df[group_type] != 'Unknown']
         if filtered_groups.empty: continue
         
-        group_rs_numerator = filtered_groups.groupby(['date', group_type]).apply(lambda x: (x['rs'] * x['market_cap']).sum(), include_groups=False)
-        group_rs_denominator = filtered_groups.groupby(['date', group_type])['market_cap'].sum()
+        # Both sides of the market-cap weighted average come from one native groupby sum.
+        group_sums = filtered_groups.assign(rs_x_mcap=filtered_groups['rs'] * filtered_groups['market_cap']).groupby(['date', group_type])[['rs_x_mcap', 'market_cap']].sum()
+        group_rs_numerator, group_rs_denominator = group_sums['rs_x_mcap'], group_sums['market_cap']
         if group_rs_numerator.empty or group_rs_denominator.empty: continue
             
         group_rs_weighted = (group_rs_numerator / group_rs_denominator).rename('group_rs_value')
         group_df = pd.DataFrame(group_rs_weighted).reset_index()
         
-        grouped = group_df.groupby(group_type)['group_rs_value']
-        group_df['group_rs_sma_20'] = grouped.transform(lambda x: x.rolling(window=20, min_periods=20).mean())
-        group_df['group_rs_sma_50'] = grouped.transform(lambda x: x.rolling(window=50, min_periods=50).mean())
-        group_df['group_rs_sma_200'] = grouped.transform(lambda x: x.rolling(window=200, min_periods=200).mean())
+        group_df.sort_values(by=[group_type, 'date'], inplace=True, ignore_index=True)
+        grouped = group_df.groupby(group_type, sort=False)['group_rs_value']
+        for window in (20, 50, 200):
+            group_df[f'group_rs_sma_{window}'] = grouped.rolling(window=window, min_periods=window).mean().reset_index(level=0, drop=True)
         
-        group_df.sort_values(by=[group_type, 'date'], inplace=True)
         roc_period = 20
-        group_df['group_rs_roc_20'] = group_df.groupby(group_type)['group_rs_value'].transform(lambda x: ((x - x.shift(roc_period)) / x.shift(roc_period)) * 100)
+        group_df['group_rs_roc_20'] = grouped.pct_change(periods=roc_period, fill_method=None) * 100
         
         group_df['above_rs_20sma'] = group_df['group_rs_value'] > group_df['group_rs_sma_20']
         group_df['above_rs_50sma'] = group_df['group_rs_value'] > group_df['group_rs_sma_50']
@@ -187,25 +228,28 @@ def calculate_group_analytics(daily_analytics_df: pd.DataFrame, stocks_df: pd.Da
 
 def calculate_market_breadth(df: pd.DataFrame, logger: logging.Logger) -> pd.DataFrame:
     logger.info("--- Calculating Market Breadth (Advance/Decline Line) ---")
-    df = df.copy()
-    df['adj_close'] = pd.to_numeric(df['adj_close'], errors='coerce')
-    df_pivot = df.pivot_table(index='date', columns='ticker', values='adj_close')
-    price_change = df_pivot.drop(columns=['^GSPC'], errors='ignore').diff()
-    advancers = (price_change > 0).sum(axis=1)
-    decliners = (price_change < 0).sum(axis=1)
-    breadth_df = pd.DataFrame({'advancers': advancers, 'decliners': decliners})
+    adj_close = pd.to_numeric(df['adj_close'], errors='coerce')
+    # (ticker, date) is unique, so a plain pivot does the reshape without pivot_table's aggregation;
+    # dropping missing prices first keeps the same dates and tickers pivot_table would.
+    has_price = adj_close.notna()
+    df_pivot = df.loc[has_price, ['date', 'ticker']].assign(adj_close=adj_close[has_price]).pivot(index='date', columns='ticker', values='adj_close')
+    prices = df_pivot.drop(columns=['^GSPC'], errors='ignore').to_numpy(dtype=np.float64)
+    # The first date has no prior close, so it counts no advancers or decliners.
+    price_change = np.diff(prices, axis=0, prepend=np.nan)
+    breadth_df = pd.DataFrame({'advancers': (price_change > 0).sum(axis=1), 'decliners': (price_change < 0).sum(axis=1)}, index=df_pivot.index)
     breadth_df['ad_line'] = (breadth_df['advancers'] - breadth_df['decliners']).cumsum()
     logger.info("✅ Market Breadth calculated.")
     return breadth_df.reset_index()
 
 def calculate_breakouts_and_volume(df: pd.DataFrame, logger: logging.Logger):
     logger.info("--- Calculating Volume Breakouts and Stats ---")
+    # Only the columns used here are carried into the sorted working frame; the caller's frame is left untouched.
+    df = df[['ticker', 'date', 'close', 'volume']].sort_values(by=['ticker', 'date'])
     df['date'] = pd.to_datetime(df['date'])
-    df.sort_values(by=['ticker', 'date'], inplace=True)
-    grouped = df.groupby('ticker')
-    
-    df['vol_ma_50'] = grouped['volume'].transform(lambda x: x.rolling(window=50, min_periods=50).mean())
-    df['close_rolling_high_20'] = grouped['close'].transform(lambda x: x.rolling(window=20, min_periods=20).max())
+    # Both windows run as native grouped rolling kernels over the sorted rows, sharing one groupby.
+    grouped = df.groupby('ticker', sort=False, observed=True)
+    df['vol_ma_50'] = grouped['volume'].rolling(window=50, min_periods=50).mean().reset_index(level=0, drop=True)
+    df['close_rolling_high_20'] = grouped['close'].rolling(window=20, min_periods=20).max().reset_index(level=0, drop=True)
     is_new_high = df['close'] >= df['close_rolling_high_20'].shift(1)
     is_high_volume = df['volume'] > (df['vol_ma_50'] * 1.5)
     df['is_breakout_stock'] = is_new_high & is_high_volume
@@ -218,10 +262,66 @@ def calculate_breakouts_and_volume(df: pd.DataFrame, logger: logging.Logger):
     )
     daily_summary['pct_above_avg_volume'] = (daily_summary['above_avg_vol_count'] / daily_summary['total_stocks']) * 100
     breakout_stats_df = daily_summary[['high_volume_breakout_count', 'pct_above_avg_volume']].round(2).dropna()
-    breakout_stocks_df = df[df['is_breakout_stock']][['date', 'ticker']].copy()
+    breakout_stocks_df = df.loc[df['is_breakout_stock'], ['date', 'ticker']]
     logger.info(f"✅ Breakout analysis complete.")
     return breakout_stats_df.reset_index(), breakout_stocks_df
 
+def refresh_daily_breadth(engine, logger: logging.Logger, start_date=None):
+    """Rebuilds the daily_breadth summary table from start_date onwards (all dates if None)."""
+    logger.info("--- Refreshing Daily Breadth Summary ---")
+    with engine.connect() as connection:
+        with connection.begin():
+            connection.execute(text("""
+                CREATE TABLE IF NOT EXISTS daily_breadth (
+                    date DATE PRIMARY KEY, total_stocks INT, pct_above_20 NUMERIC, pct_above_50 NUMERIC,
+                    pct_above_200 NUMERIC, pct_uptrend NUMERIC, pct_sideways NUMERIC, pct_downtrend NUMERIC
+                );"""))
+            # An incremental refresh only rewrites recent dates, so a new or partially filled table
+            # (one that doesn't reach back as far as the analytics) is rebuilt in full first.
+            if start_date:
+                breadth_start, analytics_start = connection.execute(text(
+                    "SELECT (SELECT MIN(date) FROM daily_breadth), (SELECT MIN(date) FROM daily_stock_analytics)")).one()
+                if breadth_start is None or (analytics_start is not None and breadth_start > analytics_start):
+                    logger.warning("⚠️ daily_breadth does not cover the full analytics history; rebuilding it in full.")
+                    start_date = None
+            date_filter = "WHERE d.date >= :start_date" if start_date else ""
+            if start_date:
+                connection.execute(text("DELETE FROM daily_breadth WHERE date >= :start_date"), {'start_date': start_date})
+            else:
+                connection.execute(text("TRUNCATE TABLE daily_breadth;"))
+            connection.execute(text(f"""
+                INSERT INTO daily_breadth (date, total_stocks, pct_above_20, pct_above_50, pct_above_200, pct_uptrend, pct_sideways, pct_downtrend)
+                SELECT
+                    d.date,
+                    COUNT(*),
+                    100.0 * SUM(CASE WHEN d.adj_close > a.ma_20 THEN 1 ELSE 0 END) / COUNT(*),
+                    100.0 * SUM(CASE WHEN d.adj_close > a.ma_50 THEN 1 ELSE 0 END) / COUNT(*),
+                    100.0 * SUM(CASE WHEN d.adj_close > a.ma_200 THEN 1 ELSE 0 END) / COUNT(*),
+                    100.0 * SUM(CASE WHEN a.trend = 'Uptrend' THEN 1 ELSE 0 END) / COUNT(*),
+                    100.0 * SUM(CASE WHEN a.trend = 'Sideways' THEN 1 ELSE 0 END) / COUNT(*),
+                    100.0 * SUM(CASE WHEN a.trend = 'Downtrend' THEN 1 ELSE 0 END) / COUNT(*)
+                FROM daily_stock_data d
+                JOIN daily_stock_analytics a ON d.ticker = a.ticker AND d.date = a.date
+                {date_filter}
+                GROUP BY d.date;
+            """), {'start_date': start_date})
+    logger.info("✅ Daily breadth summary refreshed.")
+
+def refresh_latest_stock_analytics(engine, logger: logging.Logger):
+    """Refreshes the latest-row-per-ticker materialized view read by the dashboard."""
+    logger.info("--- Refreshing Latest Stock Analytics View ---")
+    with engine.connect() as connection:
+        with connection.begin():
+            connection.execute(text("""
+                CREATE MATERIALIZED VIEW IF NOT EXISTS mv_latest_stock_analytics AS
+                SELECT DISTINCT ON (ticker) ticker, date, rs, trend, perf_1w, perf_1m, perf_3m, perf_6m, perf_ytd
+                FROM daily_stock_analytics
+                ORDER BY ticker, date DESC;"""))
+            connection.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_latest_stock_analytics_ticker ON mv_latest_stock_analytics(ticker);"))
+            # CONCURRENTLY keeps the view readable by running dashboards while it is rebuilt.
+            connection.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_latest_stock_analytics;"))
+    logger.info("✅ Latest stock analytics view refreshed.")
+
 def main():
     start_time = time.time()
     logger = setup_logging()
@@ -258,20 +358,20 @@ def main():
     # --- THIS IS THE DEFINITIVE FIX ---
     
     # 1. Load the full history for the S&P 500. This is our universal benchmark.
-    spx_query = text("SELECT ticker, date, high, low, close, adj_close, volume FROM daily_stock_data WHERE ticker = '^GSPC'")
+    spx_query = text(f"SELECT ticker, date, {RAW_PRICE_COLUMNS_SQL}, {HLCC4_SQL} FROM daily_stock_data WHERE ticker = '^GSPC'")
     spx_df = pd.read_sql(spx_query, con=engine, parse_dates=['date'])
     logger.info(f"Loaded full history for S&P 500 benchmark ({len(spx_df)} rows).")
 
     # 2. Load the incremental slice for all other stocks.
     full_recalc_list = list(tickers_to_fully_recalculate) if tickers_to_fully_recalculate else [None]
-    other_stocks_query = text("""
-        SELECT ticker, date, high, low, close, adj_close, volume 
+    other_stocks_query = text(f"""
+        SELECT ticker, date, {RAW_PRICE_COLUMNS_SQL}, {HLCC4_SQL}
         FROM daily_stock_data 
         WHERE ticker != '^GSPC' AND (ticker = ANY(:full_recalc_tickers) OR date >= :start_date)
     """)
-    other_stocks_df = pd.read_sql(
+    other_stocks_df = read_sql_streamed(
         other_stocks_query, 
-        con=engine, 
+        engine, 
         params={'full_recalc_tickers': full_recalc_list, 'start_date': data_load_date_sql}, 
         parse_dates=['date']
     )
@@ -279,12 +379,17 @@ def main():
 
     # 3. Combine them into a single DataFrame for processing.
     raw_data_df = pd.concat([spx_df, other_stocks_df], ignore_index=True)
+    # Tickers repeat on every row, so they are held as a categorical: the per-ticker groupbys
+    # below hash small integer codes instead of Python strings.
+    raw_data_df['ticker'] = raw_data_df['ticker'].astype('category')
     logger.info(f"Total raw data rows to process: {len(raw_data_df)}")
     
     # --- END OF DEFINITIVE FIX ---
     
     stocks_df = pd.read_sql("SELECT ticker, sector, industry, market_cap FROM stocks", con=engine)
-    macro_df = pd.read_sql(text("SELECT date, series_id, value FROM macro_data WHERE date >= :start_date"), con=engine, params={'start_date': recalc_from_date_sql}, parse_dates=['date'])
+    # Macro data is read from the start of the raw slice, so the first recalculated dates have a
+    # prior observation to look back to.
+    macro_df = pd.read_sql(text("SELECT date, series_id, value::float8 AS value FROM macro_data WHERE date >= :start_date"), con=engine, params={'start_date': data_load_date_sql}, parse_dates=['date'])
     
     logger.warning(f"Performing targeted deletion of analytics...")
     with engine.connect() as connection:
@@ -299,46 +404,73 @@ def main():
             connection.execute(text("DELETE FROM daily_market_indicators WHERE date >= :start_date"), {'start_date': recalc_from_date_sql})
             connection.execute(text("DELETE FROM daily_breakout_stocks WHERE date >= :start_date"), {'start_date': recalc_from_date_sql})
             
-            logger.info("Truncating group analytics to prepare for a full, consistent rebuild.")
-            connection.execute(text("TRUNCATE TABLE daily_group_analytics;"))
+            if tickers_to_fully_recalculate:
+                logger.info("Truncating group analytics to prepare for a full, consistent rebuild.")
+                connection.execute(text("TRUNCATE TABLE daily_group_analytics;"))
+            else:
+                logger.info(f"Deleting recent group analytics from {recalc_from_date_sql} onwards.")
+                connection.execute(text("DELETE FROM daily_group_analytics WHERE analysis_date >= :start_date"), {'start_date': recalc_from_date_sql})
             
             connection.execute(text("TRUNCATE TABLE refreshed_tickers_log;"))
     
-    newly_calculated_analytics_df = calculate_indicators(raw_data_df.copy(), logger, recalc_from_date)
-    
-    logger.info("Loading all stock analytics to rebuild group data...")
-    historical_analytics_df = pd.read_sql("SELECT * FROM daily_stock_analytics", con=engine, parse_dates=['date'])
-    full_analytics_df = pd.concat([historical_analytics_df, newly_calculated_analytics_df]).drop_duplicates(subset=['ticker', 'date'], keep='last')
+    newly_calculated_analytics_df = calculate_indicators(raw_data_df, logger, recalc_from_date)
+    
+    # Refreshed tickers can shift group values on any date, so they force a full group rebuild.
+    # Otherwise only the recalculated dates are rebuilt, which needs enough earlier history to
+    # warm up the 200-day group RS SMA (400 calendar days is ~275 trading days).
+    if tickers_to_fully_recalculate:
+        logger.info("Loading all stock analytics to rebuild group data...")
+        historical_analytics_df = pd.read_sql("SELECT ticker, date, rs::float8 AS rs FROM daily_stock_analytics", con=engine, parse_dates=['date'])
+    else:
+        group_context_date_sql = (recalc_from_date - timedelta(days=400)).strftime('%Y-%m-%d')
+        logger.info(f"Loading stock analytics from {group_context_date_sql} to rebuild recent group data...")
+        historical_analytics_df = pd.read_sql(text("SELECT ticker, date, rs::float8 AS rs FROM daily_stock_analytics WHERE date >= :start_date"), con=engine, params={'start_date': group_context_date_sql}, parse_dates=['date'])
+    # Newly calculated rows replace stored ones for the same (ticker, date); a hashed index lookup
+    # finds those instead of drop_duplicates over the combined frame.
+    historical_keys = pd.MultiIndex.from_frame(historical_analytics_df[['ticker', 'date']])
+    new_keys = pd.MultiIndex.from_frame(newly_calculated_analytics_df[['ticker', 'date']])
+    # The group stage only weights RS, so that is the only analytics column read back or carried.
+    full_analytics_df = pd.concat([historical_analytics_df[~historical_keys.isin(new_keys)], newly_calculated_analytics_df[['ticker', 'date', 'rs']]])
     group_analytics_df = calculate_group_analytics(full_analytics_df, stocks_df, logger)
+    if not tickers_to_fully_recalculate and not group_analytics_df.empty:
+        group_analytics_df = group_analytics_df[group_analytics_df['analysis_date'] >= pd.to_datetime(recalc_from_date)]
     
     raw_data_for_market = raw_data_df[raw_data_df['date'] >= pd.to_datetime(recalc_from_date)]
-    breakout_stats_df, breakout_stocks_df = calculate_breakouts_and_volume(raw_data_for_market.copy(), logger)
+    breakout_stats_df, breakout_stocks_df = calculate_breakouts_and_volume(raw_data_for_market, logger)
     market_breadth_df = calculate_market_breadth(raw_data_for_market, logger)
     
     logger.info("--- Saving results to database ---")
     
     if not newly_calculated_analytics_df.empty:
-        newly_calculated_analytics_df.to_sql('daily_stock_analytics', engine, if_exists='append', index=False)
+        newly_calculated_analytics_df.to_sql('daily_stock_analytics', engine, if_exists='append', index=False, method=psql_insert_copy)
+    
+    # Refreshed tickers had their whole history recalculated, which can shift breadth on any date.
+    refresh_daily_breadth(engine, logger, None if tickers_to_fully_recalculate else recalc_from_date_sql)
     
     if not market_breadth_df.empty:
-        macro_pivot_df = macro_df.pivot(index='date', columns='series_id', values='value') if not macro_df.empty else pd.DataFrame()
+        # Each series is carried forward to its latest known value, and every trading day takes
+        # the most recent macro row on or before it; a forward lookup used figures not yet published.
+        macro_pivot_df = macro_df.pivot(index='date', columns='series_id', values='value').ffill() if not macro_df.empty else pd.DataFrame()
+        # The breadth frame comes out of a pivot, so it is already date-sorted for the join and merge_asof.
         market_indicators_df = market_breadth_df.set_index('date')
         if not breakout_stats_df.empty:
             market_indicators_df = market_indicators_df.join(breakout_stats_df.set_index('date'))
         if not macro_pivot_df.empty:
             market_indicators_df = pd.merge_asof(
-                left=market_indicators_df.sort_index(), right=macro_pivot_df.sort_index(),
-                left_index=True, right_index=True, direction='forward'
+                left=market_indicators_df, right=macro_pivot_df,
+                left_index=True, right_index=True, direction='backward'
             )
         market_indicators_df.reset_index(inplace=True)
         market_indicators_df.rename(columns=lambda c: c.lower(), inplace=True)
-        market_indicators_df.to_sql('daily_market_indicators', engine, if_exists='append', index=False)
+        market_indicators_df.to_sql('daily_market_indicators', engine, if_exists='append', index=False, method=psql_insert_copy)
     
     if not breakout_stocks_df.empty:
-        breakout_stocks_df.to_sql('daily_breakout_stocks', engine, if_exists='append', index=False)
+        breakout_stocks_df.to_sql('daily_breakout_stocks', engine, if_exists='append', index=False, method=psql_insert_copy)
     
     if not group_analytics_df.empty:
-        group_analytics_df.to_sql('daily_group_analytics', engine, if_exists='append', index=False)
+        group_analytics_df.to_sql('daily_group_analytics', engine, if_exists='append', index=False, method=psql_insert_copy)
+    
+    refresh_latest_stock_analytics(engine, logger)
     
     end_time = time.time()
     logger.info(f"✅ Analytics Pipeline Completed in {end_time - start_time:.2f} seconds")
@@ -1,26 +1,40 @@
+import io
 import json
 import requests
 import pandas as pd
 import time
 import yfinance as yf
+from curl_cffi import requests as curl_requests
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 import random
-from sqlalchemy import create_engine, text, inspect, Engine
+from sqlalchemy import create_engine, text, inspect
 import traceback
 import logging
 import queue
 import os # <-- Import os for environment variables
 from dotenv import load_dotenv # <-- Import dotenv
 from dataclasses import dataclass
-from typing import Optional, Tuple, Set
+from typing import Dict, Optional, Tuple, Set
 from fredapi import Fred
+from psycopg2.extras import execute_values
 
 # --- Load Environment Variables ---
 load_dotenv()
 
 # --- Data Structures & Setup ---
+# One HTTP session shared by every yfinance call in a process, so connections to Yahoo are set up
+# once and reused across batches. yfinance requires a curl_cffi session rather than a requests one.
+# It is created per process, as download workers must not share the parent's sockets after a fork.
+_yf_session, _yf_session_pid = None, None
+
+def get_yf_session():
+    global _yf_session, _yf_session_pid
+    if _yf_session is None or _yf_session_pid != os.getpid():
+        _yf_session, _yf_session_pid = curl_requests.Session(impersonate="chrome"), os.getpid()
+    return _yf_session
+
 @dataclass
 class FailedTicker:
     ticker: str
@@ -128,107 +142,157 @@ def fetch_and_store_macro_data(engine, config, logger):
         final_df = pd.concat(all_macro_data, ignore_index=True).dropna()
         final_df['date'] = pd.to_datetime(final_df['date']).dt.date
         
+        # A single multi-row statement can't update the same key twice, so duplicates are dropped first.
+        final_df = final_df.drop_duplicates(subset=['date', 'series_id'], keep='last')
+        
         logger.info(f"Upserting {len(final_df)} macro data points to the database.")
-        with engine.connect() as connection:
-            with connection.begin():
-                for row in final_df.itertuples():
-                    stmt = text("""INSERT INTO macro_data (date, series_id, value) VALUES (:date, :series_id, :value)
-                                   ON CONFLICT (date, series_id) DO UPDATE SET value = EXCLUDED.value;""")
-                    connection.execute(stmt, {'date': row.date, 'series_id': row.series_id, 'value': row.value})
+        rows = list(final_df[['date', 'series_id', 'value']].itertuples(index=False, name=None))
+        # execute_values packs the rows into multi-row VALUES lists, one round-trip per page instead of per row.
+        raw_conn = engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cur:
+                execute_values(cur, """INSERT INTO macro_data (date, series_id, value) VALUES %s
+                                     ON CONFLICT (date, series_id) DO UPDATE SET value = EXCLUDED.value;""", rows, page_size=10000)
+            raw_conn.commit()
+        finally:
+            raw_conn.close()
         logger.info("✅ Macro data updated successfully.")
     except Exception as e:
         logger.error(f"❌ ERROR fetching/storing macro data: {e}")
 
 # --- Incremental Update Helper Functions ---
-def get_db_state(engine, logger) -> Tuple[Set[str], Optional[pd.Timestamp]]:
+STOCK_DATA_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'adj_close', 'volume', 'ticker']
+FLUSH_BATCH_ROWS = 10_000
+# COPY doesn't plateau at upsert batch sizes, so full-refresh (backfill) batches stream larger chunks.
+COPY_FLUSH_BATCH_ROWS = 100_000
+DOWNLOAD_BATCH_TICKERS = 200
+# yfinance's error text for a ticker that has no bars in the requested date range.
+YF_NO_PRICES_ERROR = "no price data found"
+STOCK_COPY_SQL = f"COPY daily_stock_data ({', '.join(STOCK_DATA_COLUMNS)}) FROM STDIN WITH CSV"
+STOCK_UPSERT_SQL = """
+    INSERT INTO daily_stock_data (date, open, high, low, close, adj_close, volume, ticker) VALUES %s
+    ON CONFLICT (ticker, date) DO UPDATE SET
+        open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
+        close = EXCLUDED.close, adj_close = EXCLUDED.adj_close, volume = EXCLUDED.volume;
+"""
+
+def get_db_state(engine, logger) -> Tuple[Dict[str, pd.Timestamp], Optional[pd.Timestamp]]:
+    """Returns each stored ticker's latest date, and the latest date overall."""
     logger.info("--- Checking current database state ---")
     with engine.connect() as connection:
-        latest_date_result = connection.execute(text("SELECT MAX(date) FROM daily_stock_data;")).scalar()
-        latest_date = pd.to_datetime(latest_date_result) if latest_date_result else None
-        existing_tickers_result = connection.execute(text("SELECT DISTINCT ticker FROM daily_stock_data;")).fetchall()
-        existing_tickers = {row[0] for row in existing_tickers_result}
+        # One grouped pass over the (ticker, date) index gives both the ticker set and each one's last date.
+        existing_tickers_result = connection.execute(text("SELECT ticker, MAX(date) FROM daily_stock_data GROUP BY ticker;")).fetchall()
+        existing_tickers = {row[0]: pd.to_datetime(row[1]) for row in existing_tickers_result}
+        latest_date = max(existing_tickers.values()) if existing_tickers else None
     logger.info(f"Latest data in DB is for: {latest_date.strftime('%Y-%m-%d') if latest_date else 'No data found'}")
     logger.info(f"Found {len(existing_tickers)} tickers with existing data.")
     return existing_tickers, latest_date
 
-def identify_stocks_for_full_refresh(tickers_to_check, logger) -> Set[str]:
+def identify_stocks_for_full_refresh(tickers_to_check, logger, threads: int = 10) -> Set[str]:
     logger.info(f"--- Checking {len(tickers_to_check)} existing stocks for recent corporate actions ---")
     stocks_to_refresh = set()
     check_since_date = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-    def check_actions(ticker):
+    # One yf.download per batch returns the last week's dividends and splits for every ticker in it,
+    # instead of an actions request per ticker. A ticker whose check failed is refreshed to be safe:
+    # yf.download doesn't raise for it, but records an error and returns an all-NaN column block.
+    tickers = sorted(tickers_to_check)
+    for i in tqdm(range(0, len(tickers), DOWNLOAD_BATCH_TICKERS), desc="Checking for splits/dividends"):
+        chunk = tickers[i:i + DOWNLOAD_BATCH_TICKERS]
         try:
-            stock = yf.Ticker(ticker)
-            actions = stock.actions
-            if not actions.empty and actions.index.max() >= pd.Timestamp(check_since_date):
-                if ('Stock Splits' in actions and actions['Stock Splits'].sum() != 0) or \
-                   ('Dividends' in actions and actions['Dividends'].sum() > 0):
-                    return ticker
-        except Exception: return ticker
-        return None
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(check_actions, ticker) for ticker in tickers_to_check}
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Checking for splits/dividends"):
-            result = future.result()
-            if result: stocks_to_refresh.add(result)
+            data = yf.download(tickers=chunk, start=check_since_date, actions=True, group_by='ticker', threads=threads, auto_adjust=False, progress=False, session=get_yf_session())
+        except Exception:
+            stocks_to_refresh.update(chunk); continue
+        errors = yf_download_errors()
+        returned = set(data.columns.get_level_values(0)) if not data.empty else set()
+        for ticker in chunk:
+            if ticker in errors or ticker not in returned or data[ticker].isna().all(axis=None):
+                stocks_to_refresh.add(ticker); continue
+            actions = data[ticker]
+            if ('Stock Splits' in actions and actions['Stock Splits'].sum() != 0) or \
+               ('Dividends' in actions and actions['Dividends'].sum() > 0):
+                stocks_to_refresh.add(ticker)
     if stocks_to_refresh: logger.warning(f"⚠️ Identified {len(stocks_to_refresh)} stocks with recent actions requiring a full refresh.")
     else: logger.info("✅ No recent corporate actions found.")
     return stocks_to_refresh
 
+def yf_download_errors() -> Dict[str, str]:
+    """Per-ticker errors recorded by the last yf.download call in this process."""
+    return dict(getattr(getattr(yf, 'shared', None), '_ERRORS', None) or {})
+
 # --- Data Fetching Worker and Orchestrator ---
-def fetch_and_store_single_stock(ticker: str, start_str: str, end_str: str, db_engine: Engine, failed_tickers_queue: queue.Queue):
-    try:
-        stock = yf.Ticker(ticker)
-        hist_df = stock.history(start=start_str, end=end_str, auto_adjust=False)
-        if hist_df.empty: return True
-        
-        hist_df.reset_index(inplace=True)
-        hist_df.columns = [str(col).lower().replace(' ', '_') for col in hist_df.columns]
-        hist_df.rename(columns={'adj_close': 'adj_close'}, inplace=True, errors='ignore')
-        if 'adj_close' not in hist_df.columns: hist_df['adj_close'] = hist_df['close']
-        
-        required_cols = ['date', 'open', 'high', 'low', 'close', 'adj_close', 'volume', 'ticker']
-        hist_df['ticker'] = ticker
-        hist_df['date'] = pd.to_datetime(hist_df['date']).dt.date
-        clean_df = hist_df[required_cols].dropna()
-        
-        if clean_df.empty: return True
+def download_stock_batch(tickers, start_str: str, end_str: str, threads: int, full_refresh: bool) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Downloads and cleans a batch of tickers in one yf.download call. Runs in a worker process.
 
-        clean_df[['open', 'high', 'low', 'close', 'adj_close']] = clean_df[['open', 'high', 'low', 'close', 'adj_close']].round(2)
-        
-        with db_engine.connect() as connection:
-            with connection.begin():
-                for row in clean_df.itertuples(index=False):
-                    params = {
-                        'date': row.date,
-                        'open': row.open,
-                        'high': row.high,
-                        'low': row.low,
-                        'close': row.close,
-                        'adj_close': row.adj_close,
-                        'volume': row.volume,
-                        'ticker': row.ticker
-                    }
-                    stmt = text("""
-                        INSERT INTO daily_stock_data (date, open, high, low, close, adj_close, volume, ticker)
-                        VALUES (:date, :open, :high, :low, :close, :adj_close, :volume, :ticker)
-                        ON CONFLICT (ticker, date) DO UPDATE SET
-                            open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
-                            close = EXCLUDED.close, adj_close = EXCLUDED.adj_close, volume = EXCLUDED.volume;
-                    """)
-                    connection.execute(stmt, params)
-        return True
-    except Exception as e:
-        failed_tickers_queue.put(FailedTicker(ticker, f"General error: {str(e)[:150]}", "permanent"))
-        return False
+    Returns the cleaned rows and, for every ticker whose download failed, the reason.
+    """
+    data = yf.download(tickers=list(tickers), start=start_str, end=end_str, group_by='ticker', threads=threads, auto_adjust=False, progress=False, session=get_yf_session())
+    if data.empty: return pd.DataFrame(columns=STOCK_DATA_COLUMNS), failed_ticker_reasons(tickers, set(), full_refresh)
+    
+    # Columns are (ticker, field); stacking the ticker level gives one row per ticker and day.
+    hist_df = data.stack(level=0, future_stack=True).rename_axis(['date', 'ticker']).reset_index()
+    hist_df.columns = hist_df.columns.astype(str).str.lower().str.replace(' ', '_', regex=False)
+    hist_df['adj_close'] = hist_df.get('adj_close', hist_df['close'])
+    
+    hist_df['date'] = pd.to_datetime(hist_df['date']).dt.date
+    # Dates a ticker didn't trade are all-NaN after the stack and drop out here with any incomplete rows.
+    # Keep the last row for a repeated date, as one batched statement can't write the same key twice.
+    # Cleaning happens in place on the stacked frame; only the final column selection makes a new one.
+    hist_df.dropna(subset=STOCK_DATA_COLUMNS, inplace=True)
+    hist_df.drop_duplicates(subset=['ticker', 'date'], keep='last', inplace=True)
+    
+    failed = failed_ticker_reasons(tickers, set(hist_df['ticker']), full_refresh)
+    if hist_df.empty: return hist_df[STOCK_DATA_COLUMNS], failed
+
+    hist_df[['open', 'high', 'low', 'close', 'adj_close']] = hist_df[['open', 'high', 'low', 'close', 'adj_close']].round(2)
+    # The stack aligns every ticker to the same dates, which turns volume into floats.
+    hist_df['volume'] = hist_df['volume'].astype('int64')
+    return hist_df[STOCK_DATA_COLUMNS], failed
+
+def failed_ticker_reasons(tickers, returned_tickers, full_refresh: bool) -> Dict[str, str]:
+    """Picks out the tickers without rows whose download actually failed, with the reason.
+
+    yf.download doesn't raise for a failed ticker; it records the error and leaves its columns all-NaN.
+    An incremental ticker with no new bars (weekend, holiday, same-day rerun) is already up to date,
+    even though yfinance records that as a 'no price data found' error too.
+    """
+    errors = yf_download_errors()
+    failed = {}
+    for ticker in tickers:
+        if ticker in returned_tickers: continue
+        reason = errors.get(ticker)
+        if full_refresh: failed[ticker] = reason or "No price data returned"
+        elif reason and YF_NO_PRICES_ERROR not in str(reason): failed[ticker] = reason
+    return failed
 
-def fetch_historical_data(stock_universe_df, config, engine, logger):
+def flush_stock_rows(raw_conn, frames, full_refresh: bool):
+    """Writes the buffered ticker frames to daily_stock_data in one statement and commits."""
+    batch_df = pd.concat(frames, ignore_index=True)
+    with raw_conn.cursor() as cur:
+        # Price rows are re-downloadable (the next run resumes from the last stored date), so this
+        # transaction's commit doesn't wait for the WAL flush.
+        cur.execute("SET LOCAL synchronous_commit = OFF")
+        if full_refresh:
+            # These tickers' rows were just deleted (or never existed), so there is nothing to
+            # upsert against and COPY streams the whole batch in one go.
+            buf = io.StringIO()
+            batch_df.to_csv(buf, index=False, header=False, columns=STOCK_DATA_COLUMNS)
+            buf.seek(0)
+            cur.copy_expert(STOCK_COPY_SQL, buf)
+        else:
+            # Columns convert to Python scalars in one tolist() each and are zipped into rows; numpy
+            # scalars from to_numpy() can't be adapted by psycopg2.
+            rows = list(zip(*(batch_df[col].tolist() for col in STOCK_DATA_COLUMNS)))
+            execute_values(cur, STOCK_UPSERT_SQL, rows, page_size=FLUSH_BATCH_ROWS)
+    raw_conn.commit()
+
+def fetch_historical_data(tickers_to_fetch, config, engine, logger):
     logger.info("--- Phase 3: Fetching Historical Market Data (Incremental Update) ---")
-    all_tickers_in_universe = set(stock_universe_df['ticker'].tolist())
+    all_tickers_in_universe = set(tickers_to_fetch)
     
     existing_tickers, latest_date_in_db = get_db_state(engine, logger)
-    stocks_needing_full_refresh = identify_stocks_for_full_refresh(existing_tickers, logger)
+    stocks_needing_full_refresh = identify_stocks_for_full_refresh(existing_tickers, logger, config['pipeline_settings']['max_workers'])
 
-    new_tickers = all_tickers_in_universe - existing_tickers
+    new_tickers = all_tickers_in_universe - existing_tickers.keys()
     stocks_to_fully_refresh = new_tickers.union(stocks_needing_full_refresh)
     stocks_to_update_incrementally = all_tickers_in_universe - stocks_to_fully_refresh
     
@@ -239,35 +303,82 @@ def fetch_historical_data(stock_universe_df, config, engine, logger):
             with connection.begin():
                 # First, log the tickers that need a full analytics recalculation.
                 logger.info(f"Logging {len(stocks_needing_full_refresh)} tickers for analytics refresh...")
-                for ticker in stocks_needing_full_refresh:
-                    stmt = text("INSERT INTO refreshed_tickers_log (ticker) VALUES (:ticker) ON CONFLICT (ticker) DO NOTHING;")
-                    connection.execute(stmt, {'ticker': ticker})
+                # Both statements take the whole ticker list as one array parameter, one round-trip each.
+                ticker_list = list(stocks_needing_full_refresh)
+                stmt = text("INSERT INTO refreshed_tickers_log (ticker) SELECT unnest(CAST(:tickers AS text[])) ON CONFLICT (ticker) DO NOTHING;")
+                connection.execute(stmt, {'tickers': ticker_list})
                 
                 # Now, delete their raw data to prepare for re-download.
                 logger.warning(f"Deleting existing raw data for {len(stocks_needing_full_refresh)} stocks before refresh...")
-                ticker_list = list(stocks_needing_full_refresh)
-                for i in range(0, len(ticker_list), 100):
-                    chunk = ticker_list[i:i+100]
-                    stmt = text("DELETE FROM daily_stock_data WHERE ticker = ANY(:tickers_to_delete)")
-                    connection.execute(stmt, {'tickers_to_delete': chunk})
+                stmt = text("DELETE FROM daily_stock_data WHERE ticker = ANY(:tickers_to_delete)")
+                connection.execute(stmt, {'tickers_to_delete': ticker_list})
             logger.info("Logging and deletion complete.")
 
     failed_tickers_queue = queue.Queue()
     full_refresh_start_date = (datetime.now() - timedelta(days=365.25 * config['yfinance']['years_of_data'])).strftime('%Y-%m-%d')
-    incremental_start_date = (latest_date_in_db + timedelta(days=1)).strftime('%Y-%m-%d') if latest_date_in_db else full_refresh_start_date
     end_date = (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
 
-    tasks = []
-    for ticker in stocks_to_fully_refresh: tasks.append({'ticker': ticker, 'start': full_refresh_start_date, 'end': end_date})
-    for ticker in stocks_to_update_incrementally: tasks.append({'ticker': ticker, 'start': incremental_start_date, 'end': end_date})
-
+    # Incremental tickers resume the day after their own last stored date. Tickers sharing a start
+    # date (normally all of them) are downloaded together in multi-ticker yf.download batches and
+    # buffered here, then written ~10k rows at a time over one connection: COPY for full refreshes
+    # and an upsert for incrementals. Batches download and parse in worker processes, a few ahead of
+    # the one being written, so parsing runs off the main process and overlaps the database time.
+    last_dates = pd.Series(existing_tickers, dtype='datetime64[ns]').loc[sorted(stocks_to_update_incrementally)]
+    incremental_starts = (last_dates + pd.Timedelta(days=1)).dt.strftime('%Y-%m-%d')
+    download_plan = [(True, sorted(stocks_to_fully_refresh), full_refresh_start_date)]
+    download_plan += [(False, tickers.index.tolist(), start_date) for start_date, tickers in incremental_starts.groupby(incremental_starts)]
+    batch_jobs = [(full_refresh, tickers[i:i + DOWNLOAD_BATCH_TICKERS], start_date)
+                  for full_refresh, tickers, start_date in download_plan for i in range(0, len(tickers), DOWNLOAD_BATCH_TICKERS)]
+    # max_workers caps concurrent Yahoo requests across all download processes combined.
+    max_workers = config['pipeline_settings']['max_workers']
+    download_workers = min(max_workers, os.cpu_count() or 1)
+    threads = max(1, max_workers // download_workers)
     success_count = 0
-    with ThreadPoolExecutor(max_workers=config['pipeline_settings']['max_workers']) as executor:
-        future_to_task = { executor.submit(fetch_and_store_single_stock, task['ticker'], task['start'], task['end'], engine, failed_tickers_queue): task for task in tasks }
-        for future in tqdm(as_completed(future_to_task), total=len(tasks), desc="Fetching & Storing Data"):
-            if future.result(): success_count += 1
+    pending, pending_rows, pending_full_refresh = [], 0, True
+    raw_conn = engine.raw_connection()
+    def flush(full_refresh):
+        nonlocal pending, pending_rows
+        frames = pending
+        if not frames: return
+        pending, pending_rows = [], 0
+        try:
+            flush_stock_rows(raw_conn, frames, full_refresh)
+        except Exception as e:
+            raw_conn.rollback()
+            tickers = set().union(*(frame['ticker'] for frame in frames))
+            logger.error(f"❌ ERROR storing a batch of {len(tickers)} tickers: {e}")
+            for ticker in tickers:
+                failed_tickers_queue.put(FailedTicker(ticker, f"Storage error: {str(e)[:150]}", "permanent"))
+    try:
+        with ProcessPoolExecutor(max_workers=download_workers) as downloader, tqdm(total=len(all_tickers_in_universe), desc="Fetching & Storing Data") as progress:
+            def start_download(job):
+                full_refresh, chunk, start_date = job
+                return downloader.submit(download_stock_batch, chunk, start_date, end_date, threads, full_refresh)
+            downloads = [start_download(job) for job in batch_jobs[:download_workers]]
+            for j, (full_refresh, chunk, _) in enumerate(batch_jobs):
+                if j + download_workers < len(batch_jobs): downloads.append(start_download(batch_jobs[j + download_workers]))
+                download, downloads[j] = downloads[j], None
+                progress.update(len(chunk))
+                if full_refresh != pending_full_refresh: flush(pending_full_refresh)
+                pending_full_refresh = full_refresh
+                try:
+                    clean_df, failed = download.result()
+                except Exception as e:
+                    for ticker in chunk:
+                        failed_tickers_queue.put(FailedTicker(ticker, f"General error: {str(e)[:150]}", "permanent"))
+                    continue
+                for ticker, reason in failed.items():
+                    failed_tickers_queue.put(FailedTicker(ticker, f"Download error: {str(reason)[:150]}", "permanent"))
+                success_count += len(chunk) - len(failed)
+                if clean_df.empty: continue
+                pending.append(clean_df)
+                pending_rows += len(clean_df)
+                if pending_rows >= (COPY_FLUSH_BATCH_ROWS if full_refresh else FLUSH_BATCH_ROWS): flush(full_refresh)
+            flush(pending_full_refresh)
+    finally:
+        raw_conn.close()
     
-    logger.info(f"✅ Data fetch complete: {success_count} tasks succeeded.")
+    logger.info(f"✅ Data fetch complete: {success_count} tickers downloaded or up to date, {failed_tickers_queue.qsize()} failed.")
     return True
 
 # --- Main Orchestrator ---
@@ -288,8 +399,11 @@ def main():
     if stock_universe_df is None or stock_universe_df.empty:
         logger.critical("❌ Stock universe is empty. Halting pipeline."); return
 
+    # The benchmark is written as its own row rather than appended to (and so copying) the universe frame.
     benchmark_ticker = config['yfinance']['benchmark_ticker']
-    if benchmark_ticker not in stock_universe_df['ticker'].values:
+    tickers_to_fetch = stock_universe_df['ticker'].tolist()
+    benchmark_row = None
+    if benchmark_ticker not in tickers_to_fetch:
         logger.info(f"Adding benchmark ticker '{benchmark_ticker}' to the universe for download.")
         benchmark_row = pd.DataFrame([{
             'ticker': benchmark_ticker,
@@ -298,18 +412,20 @@ def main():
             'market_cap_category': 'N/A',
             'market_cap': 0
         }])
-        stock_universe_df = pd.concat([stock_universe_df, benchmark_row], ignore_index=True)
+        tickers_to_fetch.append(benchmark_ticker)
     try:
         logger.info("Updating 'stocks' master table...")
         with engine.connect() as connection:
             with connection.begin():
                 connection.execute(text("TRUNCATE TABLE stocks RESTART IDENTITY CASCADE;"))
-        stock_universe_df.to_sql('stocks', con=engine, if_exists='append', index=False)
+        # Multi-row VALUES statements load the universe in a few round-trips rather than one per stock.
+        stock_universe_df.to_sql('stocks', con=engine, if_exists='append', index=False, method='multi', chunksize=5000)
+        if benchmark_row is not None: benchmark_row.to_sql('stocks', con=engine, if_exists='append', index=False)
         logger.info("✅ 'stocks' table populated with the latest universe.")
     except Exception as e:
         logger.error(f"❌ ERROR during stocks table population: {e}"); return
 
-    success = fetch_historical_data(stock_universe_df, config, engine, logger)
+    success = fetch_historical_data(tickers_to_fetch, config, engine, logger)
     
     if success:
         logger.info("--- Pipeline Completed Successfully ---")
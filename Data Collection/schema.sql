@@ -60,6 +60,31 @@ CREATE TABLE IF NOT EXISTS daily_stock_analytics (
     PRIMARY KEY (ticker, date)
 );
 
+-- Date-leading covering indexes for the per-date breadth aggregation (the join of
+-- daily_stock_data and daily_stock_analytics over a date range), so both sides can be read
+-- with index-only scans. Safe to re-run against an existing database.
+CREATE INDEX IF NOT EXISTS idx_daily_stock_data_date_ticker
+ON daily_stock_data(date, ticker) INCLUDE (adj_close);
+
+CREATE INDEX IF NOT EXISTS idx_daily_stock_analytics_date_ticker
+ON daily_stock_analytics(date, ticker) INCLUDE (ma_20, ma_50, ma_200, trend);
+
+-- The dashboard now reads the latest row per ticker from mv_latest_stock_analytics below,
+-- whose once-per-run refresh is served by the (ticker, date) primary key. The old newest-first
+-- covering index only added write cost to every analytics upsert, so it is dropped.
+DROP INDEX IF EXISTS idx_daily_stock_analytics_ticker_date_desc;
+
+-- Latest analytics row per ticker, refreshed by compute_analytics.py after each run so the
+-- dashboard's heatmap and stock list read a small precomputed table. The unique index on
+-- ticker lets the refresh run without blocking readers.
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_latest_stock_analytics AS
+SELECT DISTINCT ON (ticker) ticker, date, rs, trend, perf_1w, perf_1m, perf_3m, perf_6m, perf_ytd
+FROM daily_stock_analytics
+ORDER BY ticker, date DESC;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_latest_stock_analytics_ticker
+ON mv_latest_stock_analytics(ticker);
+
 -- CONSOLIDATED table for all market-wide indicators.
 CREATE TABLE IF NOT EXISTS daily_market_indicators (
     date DATE PRIMARY KEY,
@@ -74,6 +99,19 @@ CREATE TABLE IF NOT EXISTS daily_market_indicators (
     vixcls NUMERIC
 );
 
+-- Pre-aggregated daily breadth (share of stocks above each MA) and trend composition,
+-- rebuilt by compute_analytics.py so the dashboard reads one row per date.
+CREATE TABLE IF NOT EXISTS daily_breadth (
+    date DATE PRIMARY KEY,
+    total_stocks INT,
+    pct_above_20 NUMERIC,
+    pct_above_50 NUMERIC,
+    pct_above_200 NUMERIC,
+    pct_uptrend NUMERIC,
+    pct_sideways NUMERIC,
+    pct_downtrend NUMERIC
+);
+
 -- Stores a list of individual stocks that had a high-volume breakout on a given day.
 CREATE TABLE IF NOT EXISTS daily_breakout_stocks (
     date DATE,